@@ -0,0 +1,212 @@
+"""Columnar analytics over the report rollup, behind ``/reports/analytics``.
+
+Weekly series, trailing averages and per-department distributions are awkward
+to express in SQL and slow to compute row by row in Python. Instead the rollup
+is loaded once into NumPy arrays (one element per project, day and billable
+flag, sorted by day), and every metric is a ``bincount`` or ``cumsum`` over the
+slice of those arrays that covers the requested weeks.
+
+The arrays are cached per process and keyed by ``data_version``. That is the
+last change-log seq, which every time entry and project write advances, plus
+the listing cache versions of projects and departments (deleting a department
+detaches its projects without a change-log row). When the version moves, the
+snapshot is reloaded at most every ``analytics_refresh_seconds``, so a steady
+stream of writes cannot turn every request into a full reload.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import Integer, cast, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .cache import response_cache
+from .config import settings
+
+# Longest range, in weeks, one request may cover.
+MAX_WEEKS = 1_000
+# Days are counted from here in SQL and shifted to date ordinals afterwards (asyncpg maps
+# date.min to -infinity, so the ordinal's own epoch cannot be used).
+EPOCH = date(1970, 1, 1)
+EPOCH_JULIAN_DAY = 2_440_587.5
+
+
+@dataclass(frozen=True)
+class Columns:
+    version: str
+    loaded_at: float
+    day: np.ndarray  # date ordinals, ascending
+    project: np.ndarray
+    hours: np.ndarray
+    billable_hours: np.ndarray
+    # Project id -> index into ``departments``; projects without a department map to the last one.
+    department_of: np.ndarray
+    departments: list[tuple[Optional[int], str]]
+
+
+def data_version(db: Session) -> str:
+    seq = db.scalar(select(func.max(models.Change.seq))) or 0
+    projects, _ = response_cache.version("projects")
+    departments, _ = response_cache.version("departments")
+    return f"{response_cache.epoch}-{seq}-{projects}-{departments}"
+
+
+def _days_since_epoch(dialect: str, column):
+    """SQL for ``(column - EPOCH).days``; converting in the database halves the load time."""
+    if dialect == "postgresql":
+        return column - literal(EPOCH)
+    return cast(func.julianday(column) - EPOCH_JULIAN_DAY, Integer)
+
+
+def load(db: Session, version: str) -> Columns:
+    rollup = models.TimeEntryRollup
+    days = _days_since_epoch(db.get_bind().dialect.name, rollup.work_date)
+    # Core rather than ORM execution: this can be millions of rows.
+    rows = db.connection().execute(select(days, rollup.project_id, rollup.hours, rollup.billable)).all()
+    day = np.fromiter((r[0] for r in rows), dtype=np.int32, count=len(rows)) + EPOCH.toordinal()
+    order = np.argsort(day, kind="stable")
+    project = np.fromiter((r[1] for r in rows), dtype=np.int32, count=len(rows))[order]
+    hours = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))[order]
+    billable = np.fromiter((r[3] for r in rows), dtype=bool, count=len(rows))[order]
+
+    departments = [(d.id, d.name) for d in db.execute(select(models.Department.id, models.Department.name))]
+    departments.append((None, "No department"))
+    index = {department_id: i for i, (department_id, _) in enumerate(departments)}
+    projects = db.execute(select(models.Project.id, models.Project.department_id)).all()
+    department_of = np.full(max((p.id for p in projects), default=0) + 1, len(departments) - 1, dtype=np.int32)
+    for p in projects:
+        if p.department_id is not None:
+            department_of[p.id] = index[p.department_id]
+    return Columns(
+        version=version,
+        loaded_at=time.monotonic(),
+        day=day[order],
+        project=project,
+        hours=hours,
+        billable_hours=np.where(billable, hours, 0.0),
+        department_of=department_of,
+        departments=departments,
+    )
+
+
+class SnapshotCache:
+    def __init__(self) -> None:
+        self._columns: Optional[Columns] = None
+
+    async def get(self, db: AsyncSession) -> Columns:
+        version = await db.run_sync(data_version)
+        columns = self._columns
+        if columns is not None and (
+            columns.version == version or time.monotonic() - columns.loaded_at < settings.analytics_refresh_seconds
+        ):
+            return columns
+        self._columns = columns = await db.run_sync(load, version)
+        return columns
+
+
+snapshots = SnapshotCache()
+
+
+def _trailing_sum(values: np.ndarray, window: int) -> np.ndarray:
+    totals = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    return totals[ends] - totals[np.maximum(ends - window, 0)]
+
+
+def _ratio(part: float, whole: float) -> Optional[float]:
+    return part / whole if whole else None
+
+
+def report(
+    columns: Columns,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    window: int,
+    capacity: Optional[float],
+) -> schemas.AnalyticsReport:
+    """Metrics for the whole weeks (Monday to Sunday) covering ``[from_date, to_date]``."""
+    if from_date is not None and to_date is not None and from_date > to_date:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    day = columns.day
+    first = from_date or (date.fromordinal(int(day[0])) if len(day) else None)
+    last = to_date or (date.fromordinal(int(day[-1])) if len(day) else None)
+    # No data, or a single bound past all of it: nothing to report.
+    if first is None or last is None or first > last:
+        return schemas.AnalyticsReport(
+            data_version=columns.version, window=window, capacity=capacity, weeks=[], departments=[]
+        )
+    # Ordinals rather than dates: the week of date.max ends after it.
+    start = first.toordinal() - first.weekday()
+    end = last.toordinal() + 6 - last.weekday()
+    n = (end - start + 1) // 7
+    if n > MAX_WEEKS:
+        raise HTTPException(status_code=400, detail=f"Range spans more than {MAX_WEEKS} weeks")
+
+    lo, hi = int(np.searchsorted(day, start, side="left")), int(np.searchsorted(day, end, side="right"))
+    week = (day[lo:hi] - start) // 7
+    hours, billable = columns.hours[lo:hi], columns.billable_hours[lo:hi]
+    weekly = np.bincount(week, weights=hours, minlength=n)
+    weekly_billable = np.bincount(week, weights=billable, minlength=n)
+    trailing = _trailing_sum(weekly, window)
+    trailing_billable = _trailing_sum(weekly_billable, window)
+    weeks_in_window = np.minimum(np.arange(1, n + 1), window)
+
+    department = columns.department_of[columns.project[lo:hi]]
+    m = len(columns.departments)
+    by_department = np.bincount(department, weights=hours, minlength=m)
+    billable_by_department = np.bincount(department, weights=billable, minlength=m)
+    per_week = np.bincount(department * n + week, weights=hours, minlength=m * n).reshape(m, n)
+    p50, p90 = np.percentile(per_week, [50, 90], axis=1)
+
+    total, total_billable = float(weekly.sum()), float(weekly_billable.sum())
+    weeks = [
+        schemas.AnalyticsWeek(
+            week=date.fromordinal(start + 7 * i),
+            hours=float(weekly[i]),
+            billable_hours=float(weekly_billable[i]),
+            billable_ratio=_ratio(float(weekly_billable[i]), float(weekly[i])),
+            utilization=_ratio(float(weekly[i]), capacity),
+            billable_utilization=_ratio(float(weekly_billable[i]), capacity),
+            rolling_hours=float(trailing[i] / weeks_in_window[i]),
+            rolling_billable_ratio=_ratio(float(trailing_billable[i]), float(trailing[i])),
+        )
+        for i in range(n)
+    ]
+    departments = [
+        schemas.AnalyticsDepartment(
+            id=department_id,
+            name=name,
+            hours=float(by_department[i]),
+            billable_hours=float(billable_by_department[i]),
+            billable_ratio=_ratio(float(billable_by_department[i]), float(by_department[i])),
+            share=_ratio(float(by_department[i]), total),
+            weekly_mean=float(per_week[i].mean()),
+            weekly_p50=float(p50[i]),
+            weekly_p90=float(p90[i]),
+            weekly_max=float(per_week[i].max()),
+        )
+        for i, (department_id, name) in enumerate(columns.departments)
+        if by_department[i]
+    ]
+    departments.sort(key=lambda d: d.hours, reverse=True)
+    return schemas.AnalyticsReport(
+        data_version=columns.version,
+        start=date.fromordinal(start),
+        end=date.fromordinal(min(end, date.max.toordinal())),
+        window=window,
+        capacity=capacity,
+        hours=total,
+        billable_hours=total_billable,
+        billable_ratio=_ratio(total_billable, total),
+        utilization=_ratio(total, capacity * n) if capacity else None,
+        billable_utilization=_ratio(total_billable, capacity * n) if capacity else None,
+        weeks=weeks,
+        departments=departments,
+    )
@@ -0,0 +1,215 @@
+"""Cold storage for old time entries: one table per archived year.
+
+Archiving a year moves its rows out of ``time_entries`` into
+``time_entries_<year>`` (same columns and indexes), closes every month of the
+year so the archived rows and the report snapshots stay fixed, and records the
+year in ``time_entry_archives``. The hot table and its indexes then only hold
+the recent years, and an archived year can be backed up, vacuumed or dropped
+on its own.
+
+Reports are unaffected: they read the rollup and the period snapshots, which
+keep covering archived years. Entry listings call ``entry_sources`` to find the
+tables their date range touches and ``newest_first`` to merge them; a range
+that lies entirely inside archived years skips ``time_entries``, because closed
+months cannot gain new entries. Each archive table gets its own search index,
+and ``/search`` covers them along with ``time_entries``.
+
+    python -m app.archive status
+    python -m app.archive archive              # every year that ended archive_after_days ago
+    python -m app.archive archive --year 2021
+    python -m app.archive unarchive 2021
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import date, timedelta
+from typing import Any, Callable, Optional, Sequence
+
+from sqlalchemy import Column, ForeignKey, Index, MetaData, Select, Table, and_, delete, func, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from . import models, periods, schemas, search
+from .config import settings
+
+# The listing columns, in TimeEntryOut order.
+ENTRY_FIELDS = tuple(schemas.TimeEntryOut.model_fields)
+
+_metadata = MetaData()
+_tables: dict[int, Table] = {}
+
+
+def archive_table(year: int) -> Table:
+    """``time_entries_<year>``: the columns of ``time_entries`` without the id sequence."""
+    if year not in _tables:
+        name = f"time_entries_{year}"
+        columns = [
+            Column(
+                c.name,
+                c.type,
+                *(ForeignKey(fk.column, ondelete=fk.ondelete) for fk in c.foreign_keys),
+                primary_key=c.primary_key,
+                autoincrement=False,
+                nullable=c.nullable,
+            )
+            for c in models.TimeEntry.__table__.columns
+        ]
+        _tables[year] = Table(
+            name,
+            _metadata,
+            *columns,
+            Index(f"ix_{name}_project_date", "project_id", "work_date", "hours", "billable"),
+            Index(f"ix_{name}_work_date_id", "work_date", "id"),
+        )
+    return _tables[year]
+
+
+def entry_sources(db: Session, from_date: Optional[date], to_date: Optional[date]) -> list[Any]:
+    """``TimeEntry`` and/or aliases of the archive tables overlapping ``[from_date, to_date]``, newest first."""
+    stmt = select(models.ArchivedYear.year).order_by(models.ArchivedYear.year.desc())
+    if from_date is not None:
+        stmt = stmt.where(models.ArchivedYear.year >= from_date.year)
+    if to_date is not None:
+        stmt = stmt.where(models.ArchivedYear.year <= to_date.year)
+    years = list(db.scalars(stmt))
+    sources = [aliased(models.TimeEntry, archive_table(year), adapt_on_names=True) for year in years]
+    # Archived years are closed, so time_entries has no rows in them. An inverted range
+    # matches nothing anywhere; time_entries alone answers it with no rows.
+    bounded = from_date is not None and to_date is not None and from_date <= to_date
+    if not (bounded and years and len(years) == to_date.year - from_date.year + 1):
+        sources.insert(0, models.TimeEntry)
+    return sources
+
+
+def newest_first(
+    sources: list[Any],
+    where: Callable[[Select, Any], Select],
+    limit: Optional[int] = None,
+    columns: Sequence[str] = ENTRY_FIELDS,
+) -> Select:
+    """``columns`` of every source filtered by ``where``, ordered by (work_date, id) desc.
+
+    Each source is ordered and limited on its own, so it stays a seek on its
+    (work_date, id) index, and only the merged head is sorted. With no sources
+    it reads ``time_entries``, which ``where`` then filters as usual.
+    """
+    parts = []
+    for entity in sources or [models.TimeEntry]:
+        part = where(select(*(getattr(entity, name) for name in columns)), entity)
+        parts.append(part.order_by(entity.work_date.desc(), entity.id.desc()).limit(limit))
+    if len(parts) == 1:
+        return parts[0]
+    merged = union_all(*(select(part.subquery()) for part in parts)).subquery("time_entries")
+    return select(*merged.c).order_by(merged.c.work_date.desc(), merged.c.id.desc()).limit(limit)
+
+
+def all_entries(db: Session) -> list[Any]:
+    """Every table holding entries: ``time_entries`` and each archive table."""
+    return [models.TimeEntry.__table__, *(archive_table(year) for year in db.scalars(select(models.ArchivedYear.year)))]
+
+
+def archived_work_date(db: Session, entry_id: int) -> Optional[date]:
+    """The work date of entry ``entry_id`` if it is in an archive table, else ``None``."""
+    tables = all_entries(db)[1:]
+    if not tables:
+        return None
+    stmt = union_all(*(select(table.c.work_date).where(table.c.id == entry_id) for table in tables))
+    return db.scalars(stmt).first()
+
+
+def archivable_years(db: Session, horizon_days: int) -> list[int]:
+    """Years with entries in ``time_entries`` that ended more than ``horizon_days`` ago, oldest first."""
+    last_year = (date.today() - timedelta(days=horizon_days)).year - 1
+    oldest = db.scalar(select(func.min(models.TimeEntry.work_date)))
+    if oldest is None:
+        return []
+    hot = models.TimeEntry
+    return [
+        year
+        for year in range(oldest.year, last_year + 1)
+        if db.scalar(select(hot.id).where(hot.work_date >= date(year, 1, 1), hot.work_date < date(year + 1, 1, 1)).limit(1))
+    ]
+
+
+def archive_year(db: Session, year: int) -> int:
+    """Move ``year``'s entries into ``time_entries_<year>``. Returns the number of entries moved."""
+    if db.get(models.ArchivedYear, year) is not None:
+        raise ValueError(f"{year} is already archived")
+    if date(year + 1, 1, 1) > date.today():
+        raise ValueError("Only past years can be archived")
+    for month in range(1, 13):
+        if db.get(models.ClosedPeriod, date(year, month, 1)) is None:
+            periods.close(db, date(year, month, 1))
+    hot = models.TimeEntry.__table__
+    table = archive_table(year)
+    table.create(db.connection(), checkfirst=True)
+    in_year = and_(hot.c.work_date >= date(year, 1, 1), hot.c.work_date < date(year + 1, 1, 1))
+    names = [c.name for c in hot.columns]
+    db.execute(table.insert().from_select(names, select(*hot.columns).where(in_year)))
+    moved = db.execute(delete(hot).where(in_year)).rowcount
+    search.index_archive(db.connection(), table.name)
+    db.add(models.ArchivedYear(year=year, entry_count=moved))
+    return moved
+
+
+def unarchive_year(db: Session, year: int) -> int:
+    """Move ``year``'s entries back into ``time_entries``; its months stay closed."""
+    record = db.get(models.ArchivedYear, year)
+    if record is None:
+        raise ValueError(f"{year} is not archived")
+    hot = models.TimeEntry.__table__
+    table = archive_table(year)
+    names = [c.name for c in hot.columns]
+    try:
+        moved = db.execute(hot.insert().from_select(names, select(*table.columns))).rowcount
+    except IntegrityError as exc:
+        raise ValueError(f"ids in {table.name} are already used in time_entries ({exc.orig})") from exc
+    table.drop(db.connection())
+    search.drop_archive_index(db.connection(), table.name)
+    db.delete(record)
+    return moved
+
+
+def main(argv: list[str] | None = None) -> int:
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.archive", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    archive_cmd = commands.add_parser("archive")
+    archive_cmd.add_argument("--year", type=int, action="append", help="year to archive (default: all past the horizon)")
+    archive_cmd.add_argument("--after-days", type=int, default=settings.archive_after_days)
+    unarchive_cmd = commands.add_parser("unarchive")
+    unarchive_cmd.add_argument("year", type=int, nargs="+")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        if args.command == "status":
+            for record in db.scalars(select(models.ArchivedYear).order_by(models.ArchivedYear.year)):
+                print(f"{record.year}  {record.entry_count:>12,} entries  archived {record.archived_at:%Y-%m-%d %H:%M}")
+            print(f"time_entries: {db.scalar(select(func.count(models.TimeEntry.id))):,} entries")
+            return 0
+        if args.command == "archive":
+            years = sorted(args.year or archivable_years(db, args.after_days))
+            move, verb = archive_year, "archived"
+        else:
+            years = sorted(args.year)
+            move, verb = unarchive_year, "unarchived"
+        for year in years:
+            try:
+                moved = move(db, year)
+            except ValueError as exc:
+                db.rollback()
+                print(f"{year}: {exc}", file=sys.stderr)
+                return 1
+            # One transaction per year, so an interrupted run leaves whole years behind.
+            db.commit()
+            print(f"{verb} {year}: {moved:,} entries")
+        if not years:
+            print("nothing to archive")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
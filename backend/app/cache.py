@@ -0,0 +1,230 @@
+"""In-process response cache for the reference-data list endpoints.
+
+Every cached table has a version counter that the write handlers bump. Cached
+bodies are keyed on the request path and query string and remember the version
+they were built from, so a bump invalidates them without scanning the cache.
+The version also feeds the ``ETag``, which lets a client revalidate with
+``If-None-Match`` and get a 304 without the list being queried at all.
+
+Cached bodies are per process. When the server runs several workers
+(``shared_state_dir``), the versions live in a memory-mapped file shared by all
+of them, so a write in any worker invalidates every worker's copy and the
+ETags agree across workers.
+"""
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import secrets
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+from . import shared
+from .config import settings
+
+# Tables with a version counter; the shared version file has one slot per table.
+TABLES = ("customers", "departments", "projects")
+
+
+@dataclass
+class _Entry:
+    version: int
+    expires: float
+    body: bytes
+
+
+class CacheLookup:
+    """A cache probe for one request; ``store`` uses the version seen at lookup time."""
+
+    def __init__(self, cache: ResponseCache, request: Request, table: str):
+        self.cache = cache
+        self.request = request
+        self.table = table
+        query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        self.key = f"{request.url.path}?{query}"
+        self.version, self.last_modified = cache.version(table)
+        digest = hashlib.blake2b(self.key.encode(), digest_size=6).hexdigest()
+        self.etag = f'W/"{cache.epoch}-{table}-{self.version}-{digest}"'
+
+    def _headers(self) -> dict[str, str]:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(self.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+
+    def _not_modified(self) -> bool:
+        if_none_match = self.request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return self.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return self.last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def cached(self) -> Optional[Response]:
+        """Return a 304 or a cached 200 if possible, otherwise ``None``."""
+        if self._not_modified():
+            self.cache.count("not_modified")
+            return Response(status_code=304, headers=self._headers())
+        body = self.cache.get(self.key, self.version)
+        if body is None:
+            self.cache.count("misses")
+            return None
+        self.cache.count("hits")
+        return Response(content=body, media_type="application/json", headers=self._headers())
+
+    def store(self, body: bytes) -> Response:
+        self.cache.put(self.key, self.version, body)
+        return Response(content=body, media_type="application/json", headers=self._headers())
+
+
+class LocalVersions:
+    """Version counters of one process."""
+
+    def __init__(self) -> None:
+        # Distinguishes ETags across restarts, when the version counters start over.
+        self.epoch = secrets.token_hex(4)
+        self._lock = threading.Lock()
+        self._versions: dict[str, int] = {}
+        self._modified: dict[str, datetime] = {}
+        self._started = datetime.now(timezone.utc)
+
+    def get(self, table: str) -> tuple[int, datetime]:
+        with self._lock:
+            return self._versions.get(table, 0), self._modified.get(table, self._started)
+
+    def bump(self, tables: tuple[str, ...]) -> None:
+        with self._lock:
+            now = datetime.now(timezone.utc)
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._modified[table] = now
+
+    def all(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._versions)
+
+
+class SharedVersions:
+    """Version counters in a memory-mapped file, shared by the workers of one server.
+
+    Layout: the 8-byte epoch, then a (version, modified timestamp) slot per table.
+    Bumps take an exclusive ``flock``; reads do not lock, since the version is an
+    aligned 8-byte word and a stale read only costs a cache miss.
+    """
+
+    _SLOT = struct.Struct("<qd")
+
+    def __init__(self, path: os.PathLike):
+        size = 8 + self._SLOT.size * len(TABLES)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        shared.lock(self._fd)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                # First worker in: a new epoch and every table modified "now".
+                now = datetime.now(timezone.utc).timestamp()
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, secrets.token_hex(4).encode() + self._SLOT.pack(0, now) * len(TABLES), 0)
+        finally:
+            shared.unlock(self._fd)
+        self._map = mmap.mmap(self._fd, size)
+        self.epoch = self._map[:8].decode()
+        self._offsets = {table: 8 + i * self._SLOT.size for i, table in enumerate(TABLES)}
+
+    def get(self, table: str) -> tuple[int, datetime]:
+        version, modified = self._SLOT.unpack_from(self._map, self._offsets[table])
+        return version, datetime.fromtimestamp(modified, timezone.utc)
+
+    def bump(self, tables: tuple[str, ...]) -> None:
+        now = datetime.now(timezone.utc).timestamp()
+        shared.lock(self._fd)
+        try:
+            for table in tables:
+                offset = self._offsets[table]
+                version, _ = self._SLOT.unpack_from(self._map, offset)
+                self._SLOT.pack_into(self._map, offset, version + 1, now)
+        finally:
+            shared.unlock(self._fd)
+
+    def all(self) -> dict[str, int]:
+        return {table: self.get(table)[0] for table in TABLES}
+
+
+class ResponseCache:
+    def __init__(self, ttl: float, max_entries: int, versions: LocalVersions | SharedVersions | None = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.versions = versions or LocalVersions()
+        self.epoch = self.versions.epoch
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+    def lookup(self, request: Request, table: str) -> CacheLookup:
+        return CacheLookup(self, request, table)
+
+    def version(self, table: str) -> tuple[int, datetime]:
+        return self.versions.get(table)
+
+    def invalidate(self, *tables: str) -> None:
+        self.versions.bump(tables)
+        with self._lock:
+            self.stats["invalidations"] += len(tables)
+
+    def count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, key: str, version: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version or entry.expires < time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry.body
+
+    def put(self, key: str, version: int, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = _Entry(version, time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _counters(self) -> dict[str, int]:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
+
+    def snapshot(self) -> dict:
+        """Counters and entry counts summed over all workers, plus the table versions."""
+        totals = self._counters()
+        for counters in shared.collect("cache"):
+            for key, value in counters.items():
+                totals[key] = totals.get(key, 0) + value
+        return {**totals, "versions": self.versions.all()}
+
+
+def _create() -> ResponseCache:
+    directory = shared.state_dir()
+    versions = None
+    if directory is not None:
+        directory.mkdir(parents=True, exist_ok=True)
+        versions = SharedVersions(directory / "cache-versions")
+    cache = ResponseCache(ttl=settings.cache_ttl_seconds, max_entries=settings.cache_max_entries, versions=versions)
+    shared.publish("cache", cache._counters)
+    return cache
+
+
+response_cache = _create()
@@ -0,0 +1,252 @@
+"""Append-only change log of time entries, projects and customers, and its live feed.
+
+Write handlers call ``record`` before committing. The rows are inserted into
+``changes`` by a ``before_commit`` hook, so they commit (or roll back) together
+with the write itself. ``seq`` order is commit order: SQLite has a single
+writer, and on PostgreSQL the hook takes a transaction-scoped advisory lock
+before inserting, so a reader that has seen ``seq`` N can never later find a
+smaller one committed. Seqs are never reused, not even after ``prune``; a
+client whose ``since`` lies before the oldest retained change gets 410 from
+``GET /changes`` (a ``reset`` event on the stream) and has to reload.
+
+``GET /changes?since=N`` reads the table directly. The SSE stream is served
+from ``feed``: one task per process tails the table (woken immediately by
+commits in this process, and every ``change_poll_seconds`` for commits made by
+other workers) and fans each batch out to all connected clients, so the number
+of streams does not multiply the queries.
+
+    python -m app.changes prune --keep-days 30
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import delete, event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .config import settings
+
+SCHEMAS: dict[str, type[BaseModel]] = {
+    "time_entry": schemas.TimeEntryOut,
+    "project": schemas.ProjectOut,
+    "customer": schemas.CustomerOut,
+}
+# Arbitrary key for pg_advisory_xact_lock; serializes change-log inserts across connections.
+PG_LOCK_KEY = 0x746D_6368
+BATCH_SIZE = 1000
+_PENDING = "pending_changes"
+_COMMITTED = "committed_changes"
+
+
+def record(
+    db: Session | AsyncSession,
+    entity: str,
+    op: str,
+    obj: Any = None,
+    *,
+    entity_id: Optional[int] = None,
+    data: Optional[dict] = None,
+) -> None:
+    """Log ``op`` on ``entity`` when ``db`` next commits.
+
+    ``obj`` (an ORM instance or a row as a dict) is serialized with the entity's
+    output schema after the final flush, so generated ids and timestamps are included.
+    """
+    db.info.setdefault(_PENDING, []).append((entity, op, obj, entity_id, data))
+
+
+def mark(db: Session | AsyncSession) -> int:
+    """Position in ``db``'s pending changes, to ``discard`` back to after a rolled-back savepoint."""
+    return len(db.info.get(_PENDING, ()))
+
+
+def discard(db: Session | AsyncSession, position: int) -> None:
+    del db.info.get(_PENDING, [])[position:]
+
+
+@event.listens_for(Session, "before_commit")
+def _write_changes(session: Session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    session.flush()
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PG_LOCK_KEY})
+    rows = []
+    for entity, op, obj, entity_id, data in pending:
+        if obj is not None:
+            validated = SCHEMAS[entity].model_validate(obj)
+            entity_id = validated.id
+            data = validated.model_dump(mode="json")
+        rows.append(models.Change(entity=entity, op=op, entity_id=entity_id, data=data))
+    session.add_all(rows)
+    session.flush()
+    session.info[_COMMITTED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _notify(session: Session) -> None:
+    if session.info.pop(_COMMITTED, False):
+        feed.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+    session.info.pop(_COMMITTED, None)
+
+
+def as_dict(change: models.Change) -> dict[str, Any]:
+    return {
+        "seq": change.seq,
+        "entity": change.entity,
+        "op": change.op,
+        "entity_id": change.entity_id,
+        "data": change.data,
+        "created_at": change.created_at,
+    }
+
+
+async def since(db: AsyncSession, seq: int, limit: int = BATCH_SIZE) -> list[models.Change]:
+    stmt = select(models.Change).where(models.Change.seq > seq).order_by(models.Change.seq).limit(limit)
+    return list((await db.scalars(stmt)).all())
+
+
+async def pruned_after(db: AsyncSession, seq: int) -> bool:
+    """Whether changes after ``seq`` may have been pruned: the oldest retained one is not ``seq + 1``.
+
+    PostgreSQL's sequence can skip a number a rolled-back write took, so one lost right
+    before the oldest row costs such a client a needless reload, never a missed change.
+    """
+    oldest = await db.scalar(select(func.min(models.Change.seq)))
+    return oldest is not None and oldest > seq + 1
+
+
+async def last_seq(db: AsyncSession) -> int:
+    return await db.scalar(select(func.max(models.Change.seq))) or 0
+
+
+class Subscriber:
+    """Changes waiting to be sent to one stream.
+
+    A client that falls more than ``change_stream_buffer`` changes behind is
+    cut off rather than buffered without bound; it reconnects with
+    ``Last-Event-ID`` and catches up from the table.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.pending: list[dict[str, Any]] = []
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def offer(self, batch: list[dict[str, Any]]) -> None:
+        if len(self.pending) + len(batch) > self.limit:
+            self.overflowed = True
+            self.pending = []
+        else:
+            self.pending.extend(batch)
+        self.ready.set()
+
+    def take(self) -> list[dict[str, Any]]:
+        batch, self.pending = self.pending, []
+        self.ready.clear()
+        return batch
+
+
+class ChangeFeed:
+    def __init__(self) -> None:
+        self._subscribers: set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._started: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last = 0
+
+    def notify(self) -> None:
+        """Wake the tailer; safe to call from any thread."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def subscribe(self) -> Subscriber:
+        """Register a stream; it receives every change committed after the tailer's position.
+
+        Callers replay their backlog from the table *after* this returns, so the
+        two overlap rather than leave a gap; duplicates are dropped by ``seq``.
+        """
+        loop = asyncio.get_running_loop()
+        subscriber = Subscriber(settings.change_stream_buffer)
+        self._subscribers.add(subscriber)
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._started = asyncio.Event()
+            self._task = loop.create_task(self._tail(self._wake, self._started))
+        await self._started.wait()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        if not self._subscribers and self._wake is not None:
+            self._wake.set()
+
+    async def _tail(self, wake: asyncio.Event, started: asyncio.Event) -> None:
+        from .database import AsyncSessionLocal
+
+        try:
+            async with AsyncSessionLocal() as db:
+                self._last = await last_seq(db)
+        finally:
+            started.set()
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=settings.change_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+            while self._subscribers:
+                async with AsyncSessionLocal() as db:
+                    batch = [as_dict(change) for change in await since(db, self._last)]
+                if not batch:
+                    break
+                self._last = batch[-1]["seq"]
+                for subscriber in list(self._subscribers):
+                    subscriber.offer(batch)
+                if len(batch) < BATCH_SIZE:
+                    break
+
+
+feed = ChangeFeed()
+
+
+def prune(db: Session, keep_days: int) -> int:
+    """Delete changes older than ``keep_days``; clients behind that point are told to reload (``pruned_after``)."""
+    cutoff = datetime.utcnow() - timedelta(days=keep_days)
+    return db.execute(delete(models.Change).where(models.Change.created_at < cutoff)).rowcount
+
+
+def main(argv: list[str] | None = None) -> int:
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.changes", description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["prune"])
+    parser.add_argument("--keep-days", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        removed = prune(db, args.keep_days)
+        db.commit()
+    print(f"removed {removed} changes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
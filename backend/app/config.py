@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from typing import Any, Literal, Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Runtime configuration, read from ``TIMEMANAGER_*`` environment variables or ``.env``."""
+
+    model_config = SettingsConfigDict(env_prefix="TIMEMANAGER_", env_file=".env", extra="ignore")
+
+    database_url: str = "sqlite:///./timemanager.db"
+    # Used by the async request path; derived from database_url (aiosqlite/asyncpg) when unset.
+    async_database_url: Optional[str] = None
+    # Extra DBAPI connect() arguments as JSON, e.g. {"sslmode": "require"} for psycopg2
+    # and {"ssl": "require"} for asyncpg.
+    connect_args: dict[str, Any] = {}
+    async_connect_args: dict[str, Any] = {}
+
+    # "default" keeps SQLite's stock behaviour; "production" applies the pragmas,
+    # pool sizing and write serialization below. PostgreSQL always uses the pool settings.
+    engine_profile: Literal["default", "production"] = "default"
+
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64_000  # negative values are KiB
+    sqlite_busy_timeout_ms: int = 5_000
+
+    pool_size: int = 8
+    max_overflow: int = 16
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1_800
+
+    serialize_writes: bool = True
+
+    # Apply pending migrations when the app starts. `python -m app.serve` migrates once
+    # before starting its workers and turns this off for them.
+    auto_migrate: bool = True
+    # Directory through which the workers of one server share cache versions and metrics
+    # (see app/shared.py). `python -m app.serve` sets it; unset keeps both per process.
+    shared_state_dir: Optional[str] = None
+    # How often each worker publishes its metrics there.
+    metrics_flush_seconds: float = 1.0
+
+    # Response cache for the customer/project/department listings.
+    cache_ttl_seconds: float = 30.0
+    cache_max_entries: int = 512
+
+    # Opt-in group commit for single time-entry creates and updates (see app/groupcommit.py):
+    # one writer task per process collects them for up to the window after the first, or
+    # until it has max_batch, and commits them in one transaction.
+    group_commit: bool = False
+    group_commit_window_ms: float = 2.0
+    group_commit_max_batch: int = 100
+
+    # Idempotency-Key on the write routes (see app/idempotency.py): how long a successful
+    # response is kept for replay, how many are kept, and how long a repeat waits for the
+    # request it duplicates to finish.
+    idempotency_ttl_seconds: float = 86_400.0
+    idempotency_max_entries: int = 10_000
+    idempotency_wait_seconds: float = 30.0
+    # With shared_state_dir: a running request's marker is refreshed while it runs, and one
+    # left unrefreshed this long is taken to belong to a worker that died mid-request.
+    idempotency_pending_lease_seconds: float = 60.0
+
+    # Token bucket per client on the write routes (see app/ratelimit.py): sustained writes
+    # per second and burst size. Unset turns the limit off. Clients are told apart by this
+    # header when set (e.g. X-Forwarded-For behind a proxy), otherwise by their address.
+    write_rate_limit: Optional[float] = None
+    write_rate_burst: int = 20
+    rate_limit_client_header: Optional[str] = None
+
+    # Request/SQL instrumentation served on /metrics.
+    metrics_enabled: bool = True
+    # Statements at least this slow are logged with their parameters.
+    slow_query_ms: float = 200.0
+    # Adds a Server-Timing header with app and database time to every response.
+    server_timing: bool = False
+
+    # Change feed (/changes/stream): how often each worker checks for commits made by
+    # other processes, the SSE keepalive interval, and how many undelivered changes
+    # a slow client may accumulate before it is disconnected.
+    change_poll_seconds: float = 1.0
+    change_keepalive_seconds: float = 15.0
+    change_stream_buffer: int = 10_000
+
+    # `python -m app.archive archive` moves years that ended more than this many days ago
+    # out of time_entries into per-year tables.
+    archive_after_days: int = 730
+
+    # /reports/analytics reloads its in-memory copy of the rollup after writes, but at most
+    # this often.
+    analytics_refresh_seconds: float = 5.0
+
+    @property
+    def production(self) -> bool:
+        return self.engine_profile == "production"
+
+
+settings = Settings()
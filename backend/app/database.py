@@ -1,23 +1,99 @@
 from __future__ import annotations
 
-from contextlib import contextmanager
-from typing import Iterator
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-DATABASE_URL = "sqlite:///./timemanager.db"
+from . import metrics
+from .config import settings
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    future=True,
-)
+DATABASE_URL = settings.database_url
+
+_is_sqlite = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _async_url(url: str) -> str:
+    """Swap the sync driver in ``url`` for its asyncio counterpart (aiosqlite / asyncpg)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r}; set TIMEMANAGER_ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = settings.async_database_url or _async_url(DATABASE_URL)
+
+
+def _engine_options(is_async: bool = False) -> dict[str, Any]:
+    options: dict[str, Any] = {"future": True}
+    connect_args = dict(settings.async_connect_args if is_async else settings.connect_args)
+    if _is_sqlite:
+        connect_args.setdefault("check_same_thread", False)
+        if is_async:
+            # aiosqlite defaults to NullPool, which opens a connection (and thread) per request.
+            options["poolclass"] = AsyncAdaptedQueuePool
+    if connect_args:
+        options["connect_args"] = connect_args
+    # Server databases always get the configured pool; SQLite only in the production profile.
+    if settings.production or not _is_sqlite:
+        options.update(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+            pool_pre_ping=True,
+        )
+    return options
+
+
+engine = create_engine(DATABASE_URL, **_engine_options())
+
+
+@event.listens_for(engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    if not _is_sqlite:
+        return
+    cursor = dbapi_connection.cursor()
+    # Deletes rely on the schema's ON DELETE actions, which SQLite only applies with this on.
+    cursor.execute("PRAGMA foreign_keys=ON")
+    if settings.production:
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.close()
+
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(is_async=True))
+event.listen(async_engine.sync_engine, "connect", _configure_sqlite)
+
+if settings.metrics_enabled:
+    metrics.instrument(engine)
+    metrics.instrument(async_engine.sync_engine)
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
+# SQLite allows one writer at a time; letting write requests queue here instead of
+# inside SQLite avoids "database is locked" errors, and WAL keeps readers unblocked.
+# Every write path goes through async_write_session, so this one lock covers them all.
+_write_lock = asyncio.Lock()
+
+
+def _serialize_writes() -> bool:
+    return _is_sqlite and settings.production and settings.serialize_writes
+
 
 def get_db() -> Iterator[Session]:
     db = SessionLocal()
@@ -25,3 +101,26 @@ def get_db() -> Iterator[Session]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@asynccontextmanager
+async def async_write_session() -> AsyncIterator[AsyncSession]:
+    """Session for code that writes; serialized per process in the production SQLite profile."""
+    if not _serialize_writes():
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    async with _write_lock:
+        async with AsyncSessionLocal() as db:
+            yield db
+
+
+async def get_async_write_db() -> AsyncIterator[AsyncSession]:
+    """``async_write_session`` as a dependency, for handlers that write."""
+    async with async_write_session() as db:
+        yield db
@@ -0,0 +1,52 @@
+"""Classify integrity errors so write handlers can let the database enforce constraints.
+
+Instead of a SELECT before every INSERT/UPDATE/DELETE to check that a name is
+free or a referenced row exists, the handlers run the write and translate the
+constraint violation into the API's 4xx response.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Iterator, Literal, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+Violation = Literal["unique", "foreign_key", "not_null"]
+
+# PostgreSQL SQLSTATEs (psycopg2 exposes pgcode, asyncpg's adapter sets both).
+_SQLSTATES: dict[str, Violation] = {"23505": "unique", "23503": "foreign_key", "23502": "not_null"}
+# SQLite only reports the constraint kind in the message.
+_MESSAGES: dict[str, Violation] = {
+    "UNIQUE constraint failed": "unique",
+    "FOREIGN KEY constraint failed": "foreign_key",
+    "NOT NULL constraint failed": "not_null",
+}
+
+
+def violation(exc: IntegrityError) -> Optional[Violation]:
+    orig = exc.orig
+    code = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    if code in _SQLSTATES:
+        return _SQLSTATES[code]
+    message = str(orig)
+    for prefix, kind in _MESSAGES.items():
+        if prefix in message:
+            return kind
+    return None
+
+
+@contextmanager
+def constraint_errors(**responses: tuple[int, str]) -> Iterator[None]:
+    """Turn an ``IntegrityError`` of a listed kind into ``HTTPException(status, detail)``.
+
+        with constraint_errors(unique=(400, "Customer name already exists")):
+            await db.execute(stmt)
+    """
+    try:
+        yield
+    except IntegrityError as exc:
+        response = responses.get(violation(exc) or "")
+        if response is None:
+            raise
+        raise HTTPException(status_code=response[0], detail=response[1]) from None
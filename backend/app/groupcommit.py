@@ -0,0 +1,130 @@
+"""Group commit for single time-entry writes.
+
+Each ``POST /time-entries`` and ``PUT /time-entries/{id}`` is a small
+transaction, and on SQLite every commit pays for its own journal sync, so a
+burst of concurrent submissions is bounded by commits per second rather than
+by the work in them. With ``group_commit`` on, the handlers hand their write to
+one writer task per process instead. It collects writes for up to
+``group_commit_window_ms`` after the first arrives, or until it has
+``group_commit_max_batch``, runs each in its own savepoint, and commits the
+batch once. A write that fails rolls back to its savepoint and its caller gets
+its own error (404, closed period, unknown project); the others are unaffected.
+If the commit itself fails, every caller in the batch gets that error.
+
+While a batch commits, new writes queue up and form the next batch, so batches
+grow with the load. The window is only waited out after a batch of more than
+one write, so a lone writer is not delayed by it; under load it adds up to the
+window to each write's latency in exchange for fewer, larger commits.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import changes
+from .config import settings
+from .database import async_write_session
+from .metrics import registry
+
+T = TypeVar("T")
+Write = Callable[[AsyncSession], Awaitable[T]]
+
+
+async def run(write: Write[T]) -> T:
+    """Run ``write`` (which must not commit itself) and commit it, batched when ``group_commit`` is on."""
+    if settings.group_commit:
+        return await committer.submit(write)
+    async with async_write_session() as db:
+        result = await write(db)
+        await db.commit()
+        return result
+
+
+class GroupCommitter:
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_batch = 0
+
+    async def submit(self, write: Write[T]) -> T:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            # An empty context, so the writer's statements are not counted against the
+            # request that happened to start it.
+            self._task = loop.create_task(self._run(self._queue), context=contextvars.Context())
+        future = loop.create_future()
+        self._queue.put_nowait((write, future))
+        return await future
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            # Only wait for company once the last batch had some; a lone writer is not delayed.
+            deadline = loop.time() + (self.window if self._last_batch > 1 else 0.0)
+            while len(batch) < self.max_batch:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._last_batch = len(batch)
+            await self._commit(batch)
+
+    async def _commit(self, batch: list[tuple[Write, asyncio.Future]]) -> None:
+        # Callers that went away before their turn are skipped.
+        batch = [(write, future) for write, future in batch if not future.done()]
+        if not batch:
+            return
+        outcomes: dict[asyncio.Future, tuple[object, Optional[Exception]]] = {}
+        failed: Optional[Exception] = None
+        # A write alone in its batch needs no savepoint: if it fails, nothing is committed.
+        isolate = len(batch) > 1
+        try:
+            async with async_write_session() as db:
+                if isolate and db.bind.dialect.name == "sqlite":
+                    # pysqlite opens the transaction lazily, at the first INSERT or UPDATE; a
+                    # SAVEPOINT before that would start one of its own, committed on RELEASE.
+                    await db.execute(text("BEGIN IMMEDIATE"))
+                for write, future in batch:
+                    position = changes.mark(db)
+                    try:
+                        if isolate:
+                            async with db.begin_nested():
+                                outcomes[future] = (await write(db), None)
+                        else:
+                            outcomes[future] = (await write(db), None)
+                    except Exception as exc:
+                        changes.discard(db, position)
+                        outcomes[future] = (None, exc)
+                if any(error is None for _, error in outcomes.values()):
+                    await db.commit()
+        except Exception as exc:
+            failed = exc  # nothing in the batch was written
+        else:
+            registry.observe_group_commit(len(batch))
+        for _, future in batch:
+            if future.done():
+                continue
+            result, error = outcomes.get(future, (None, None))
+            if error is not None or failed is not None:
+                future.set_exception(error or failed)
+            else:
+                future.set_result(result)
+
+
+committer = GroupCommitter(settings.group_commit_window_ms / 1000, settings.group_commit_max_batch)
@@ -0,0 +1,362 @@
+"""``Idempotency-Key`` support for the write routes.
+
+A client that may retry a POST, PUT, PATCH or DELETE sends a unique key with
+it. The first request with a key runs normally and, if it succeeds, its
+response is stored for ``idempotency_ttl_seconds``; repeats of the key get
+that response back (marked ``Idempotent-Replayed: true``) without reaching the
+handlers or the database. A repeat that arrives while the first request is
+still running waits for its result instead of running alongside it, so a
+burst of retries is coalesced into one write.
+
+A key reused for a different request (method, path, query or body) is refused
+with 422. Only successful (2xx) responses are stored: a failed request can be
+retried with the same key, and so can the request a redirect points to. Keys
+are scoped to the client (``ratelimit.client_id``), so two clients that pick
+the same key never see each other's responses.
+
+The body is part of the fingerprint and is read before the request runs, so a
+keyed body may be at most ``MAX_KEYED_BODY`` bytes (413 otherwise). The bulk
+import streams bodies far larger than that and ignores the header.
+
+Stored responses live in memory, at most ``idempotency_max_entries`` of them.
+With ``shared_state_dir`` they are files in its ``idempotency`` subdirectory
+instead, so a retry that lands on another worker is still recognised; the
+worker running a request keeps its ``.pending`` marker fresh, so however long
+the request takes (a bulk import, say) no other worker runs it a second time.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+from . import shared
+from .ratelimit import client_id
+from .config import settings
+
+METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+MAX_KEY_LENGTH = 255
+# Larger responses are passed through without being stored.
+MAX_STORED_BODY = 1024 * 1024
+# Larger keyed request bodies are refused rather than buffered.
+MAX_KEYED_BODY = 1024 * 1024
+# Streaming uploads, passed through without idempotency.
+_UNKEYED_SUFFIXES = ("/bulk", "/bulk/")
+# How often a repeat checks whether the request it waits for has finished.
+POLL_SECONDS = 0.02
+# Per-response headers that a replay should not repeat.
+_UNSTORED_HEADERS = frozenset({b"server-timing", b"date"})
+
+
+@dataclass
+class Stored:
+    fingerprint: str
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+    def dumps(self) -> bytes:
+        return orjson.dumps(
+            {
+                "fingerprint": self.fingerprint,
+                "status": self.status,
+                "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in self.headers],
+                "body": base64.b64encode(self.body).decode(),
+            }
+        )
+
+    @classmethod
+    def loads(cls, data: bytes) -> Stored:
+        raw = orjson.loads(data)
+        return cls(
+            fingerprint=raw["fingerprint"],
+            status=raw["status"],
+            headers=[(k.encode("latin-1"), v.encode("latin-1")) for k, v in raw["headers"]],
+            body=base64.b64decode(raw["body"]),
+        )
+
+
+class MemoryStore:
+    """Stored responses of one process, evicted by age and, past ``max_entries``, least recently used."""
+
+    # Pending keys vanish with the process, so there is nothing to keep alive.
+    refresh_seconds: Optional[float] = None
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, Stored]] = OrderedDict()
+        self._pending: set[str] = set()
+
+    def get(self, key: str) -> Optional[Stored]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def claim(self, key: str) -> bool:
+        """Mark ``key`` as running; ``False`` if another request already has it."""
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            return True
+
+    def refresh(self, key: str) -> None:
+        pass
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._pending.discard(key)
+
+    def put(self, key: str, stored: Stored) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, stored)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class FileStore:
+    """Stored responses as files shared by the workers of one server.
+
+    ``<digest>.json`` holds a stored response, ``<digest>.pending`` marks a key
+    whose request is running (created with ``O_EXCL``, so one worker wins). The
+    owner refreshes the marker every ``refresh_seconds``; one older than
+    ``stale_pending`` is taken over. Files older than the TTL are ignored and swept, together with the oldest
+    files past ``max_entries``, at most once per ``sweep_seconds``.
+    """
+
+    def __init__(self, directory: Path, ttl: float, max_entries: int, stale_pending: float, sweep_seconds: float = 60.0):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # A marker this old belongs to a worker that died mid-request.
+        self.stale_pending = stale_pending
+        self.refresh_seconds = stale_pending / 3
+        self.sweep_seconds = sweep_seconds
+        self._swept = time.monotonic()
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.directory / (hashlib.sha256(key.encode()).hexdigest() + suffix)
+
+    def get(self, key: str) -> Optional[Stored]:
+        path = self._path(key, ".json")
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            return Stored.loads(path.read_bytes())
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def claim(self, key: str) -> bool:
+        path = self._path(key, ".pending")
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime < self.stale_pending:
+                        return False
+                    path.unlink()
+                except FileNotFoundError:
+                    pass  # released meanwhile; try again
+        return False
+
+    def refresh(self, key: str) -> None:
+        try:
+            os.utime(self._path(key, ".pending"))
+        except FileNotFoundError:
+            pass
+
+    def release(self, key: str) -> None:
+        self._path(key, ".pending").unlink(missing_ok=True)
+
+    def put(self, key: str, stored: Stored) -> None:
+        path = self._path(key, ".json")
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(stored.dumps())
+        os.replace(tmp, path)
+        if time.monotonic() - self._swept > self.sweep_seconds:
+            self._swept = time.monotonic()
+            self.sweep()
+
+    def sweep(self) -> None:
+        entries = []
+        cutoff = time.time() - self.ttl
+        for path in self.directory.glob("*.json"):
+            try:
+                mtime = path.stat().st_mtime
+                if mtime < cutoff:
+                    path.unlink()
+                else:
+                    entries.append((mtime, path))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        for _, path in entries[: max(0, len(entries) - self.max_entries)]:
+            path.unlink(missing_ok=True)
+
+
+def _create() -> MemoryStore | FileStore:
+    directory = shared.state_dir()
+    if directory is not None:
+        return FileStore(
+            directory / "idempotency",
+            ttl=settings.idempotency_ttl_seconds,
+            max_entries=settings.idempotency_max_entries,
+            stale_pending=settings.idempotency_pending_lease_seconds,
+        )
+    return MemoryStore(ttl=settings.idempotency_ttl_seconds, max_entries=settings.idempotency_max_entries)
+
+
+def _error(status: int, detail: str) -> Stored:
+    return Stored("", status, [(b"content-type", b"application/json")], orjson.dumps({"detail": detail}))
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware that stores and replays responses to keyed write requests."""
+
+    def __init__(self, app, store: MemoryStore | FileStore | None = None):
+        self.app = app
+        self.store = store or _create()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(b"idempotency-key")
+        if key is None or scope["path"].endswith(_UNKEYED_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await self._send(send, _error(400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"))
+            return
+        too_large = _error(413, f"Requests with an Idempotency-Key may have at most {MAX_KEYED_BODY} bytes of body")
+        length = headers.get(b"content-length", b"0")
+        if not length.isdigit() or int(length) > MAX_KEYED_BODY:
+            await self._send(send, too_large)
+            return
+
+        # The body is part of the fingerprint, so it is read up front and replayed to the app.
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > MAX_KEYED_BODY:
+                await self._send(send, too_large)
+                return
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        digest = hashlib.sha256()
+        # Without the trailing slash: "/time-entries" redirects to "/time-entries/", and a
+        # retry of the former should replay what the latter stored.
+        path = scope["path"].rstrip("/").encode()
+        for part in (scope["method"].encode(), path, scope.get("query_string", b""), body):
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        fingerprint = digest.hexdigest()
+        store_key = f"{client_id(scope)} {key.decode('latin-1')}"
+
+        deadline = time.monotonic() + settings.idempotency_wait_seconds
+        while True:
+            stored = self.store.get(store_key)
+            if stored is not None:
+                await self._replay(send, stored, fingerprint)
+                return
+            if self.store.claim(store_key):
+                break
+            if time.monotonic() > deadline:
+                await self._send(send, _error(409, "A request with this Idempotency-Key is still in progress"))
+                return
+            await asyncio.sleep(POLL_SECONDS)
+
+        heartbeat = None
+        if self.store.refresh_seconds is not None:
+            heartbeat = asyncio.create_task(self._keep_claim(store_key, self.store.refresh_seconds))
+        try:
+            # A request that finished between the lookup and the claim.
+            stored = self.store.get(store_key)
+            if stored is not None:
+                await self._replay(send, stored, fingerprint)
+                return
+            await self._run(scope, receive, body, send, store_key, fingerprint)
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            self.store.release(store_key)
+
+    async def _keep_claim(self, store_key: str, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.store.refresh(store_key)
+
+    async def _run(self, scope, receive, body: bytes, send, store_key: str, fingerprint: str) -> None:
+        replayed = False
+
+        async def receive_wrapper():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response: Optional[Stored] = None
+        chunks: list[bytes] = []
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal response, size
+            if message["type"] == "http.response.start":
+                if 200 <= message["status"] < 300:
+                    headers = [(k, v) for k, v in message.get("headers", []) if k.lower() not in _UNSTORED_HEADERS]
+                    response = Stored(fingerprint, message["status"], headers, b"")
+            elif message["type"] == "http.response.body" and response is not None:
+                chunks.append(message.get("body", b""))
+                size += len(chunks[-1])
+                if size > MAX_STORED_BODY:
+                    response = None
+                    chunks.clear()
+                elif not message.get("more_body", False):
+                    response.body = b"".join(chunks)
+                    self.store.put(store_key, response)
+            await send(message)
+
+        await self.app(scope, receive_wrapper, send_wrapper)
+
+    async def _replay(self, send, stored: Stored, fingerprint: str) -> None:
+        if stored.fingerprint != fingerprint:
+            await self._send(send, _error(422, "Idempotency-Key was already used for a different request"))
+            return
+        headers = [*stored.headers, (b"idempotent-replayed", b"true")]
+        await self._send(send, Stored(stored.fingerprint, stored.status, headers, stored.body))
+
+    @staticmethod
+    async def _send(send, response: Stored) -> None:
+        headers = [(k, v) for k, v in response.headers if k.lower() != b"content-length"]
+        headers.append((b"content-length", str(len(response.body)).encode()))
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
@@ -3,15 +3,27 @@ from __future__ import annotations
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import Base, engine
-from .routers import customers, departments, projects, time_entries, reports
+from . import migrations, shared
+from .config import settings
+from .database import engine
+from .idempotency import IdempotencyMiddleware
+from .metrics import MetricsMiddleware
+from .ratelimit import RateLimitMiddleware
+from .routers import changes, customers, departments, periods, projects, time_entries, reports, search, system
 
 
 def create_app() -> FastAPI:
-    Base.metadata.create_all(bind=engine)
+    if settings.auto_migrate:
+        migrations.upgrade(engine)
+    shared.start()
 
     app = FastAPI(title="Time Manager API", version="0.1.0")
 
+    # Added innermost first: a replayed write skips the rate limit, and CORS wraps both so
+    # browsers can read their 409/422/429 responses.
+    if settings.write_rate_limit:
+        app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(IdempotencyMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=[
@@ -21,13 +33,20 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Idempotent-Replayed", "Retry-After"],
     )
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
 
     app.include_router(customers.router)
     app.include_router(departments.router)
     app.include_router(projects.router)
     app.include_router(time_entries.router)
     app.include_router(reports.router)
+    app.include_router(periods.router)
+    app.include_router(search.router)
+    app.include_router(changes.router)
+    app.include_router(system.router)
 
     return app
 
@@ -0,0 +1,252 @@
+"""Request and SQL instrumentation, exported in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and labels it with the matched route
+template, so ``/projects/{project_id}`` is one series rather than one per id.
+``instrument(engine)`` hooks the cursor events of an engine: every statement is
+timed, counted against the request that issued it (to make N+1 patterns show up
+as a high statement count) and logged with its parameters when it is slower than
+``slow_query_ms``. With ``server_timing`` enabled each response also carries a
+``Server-Timing`` header with the totals for that request.
+
+With several workers (``shared_state_dir``) each worker publishes its series
+through ``app.shared`` and ``/metrics`` renders the sum over all of them.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import shared
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+MAX_LOGGED_PARAMS = 1_000
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: Iterable[float]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def state(self) -> list:
+        return [[list(label_values), list(series)] for label_values, series in self._series.items()]
+
+    def render(self, states: Iterable[list] = ()) -> Iterable[str]:
+        """This histogram's series plus those of ``states`` (other workers' ``state()``)."""
+        merged = {label_values: list(series) for label_values, series in self._series.items()}
+        for state in states:
+            for label_values, series in state:
+                total = merged.setdefault(tuple(label_values), [0] * len(series))
+                for i, value in enumerate(series):
+                    total[i] += value
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, series in sorted(merged.items()):
+            labels = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values)]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series[:-1]):
+                cumulative += count
+                bucket_labels = ",".join([*labels, f'le="{bound}"'])
+                yield f"{self.name}_bucket{{{bucket_labels}}} {cumulative}"
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            yield f"{self.name}_sum{suffix} {series[-1]}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def render(self, states: Iterable[int] = ()) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        yield f"{self.name} {self.value + sum(states)}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.request_duration = Histogram(
+            "timemanager_http_request_duration_seconds",
+            "Time from receiving a request to sending the last byte of the response.",
+            ("method", "route", "status"),
+            LATENCY_BUCKETS,
+        )
+        self.request_statements = Histogram(
+            "timemanager_http_request_sql_statements",
+            "SQL statements executed while handling one request.",
+            ("method", "route"),
+            STATEMENT_BUCKETS,
+        )
+        self.query_duration = Histogram(
+            "timemanager_sql_query_duration_seconds",
+            "Execution time of individual SQL statements.",
+            ("operation",),
+            LATENCY_BUCKETS,
+        )
+        self.group_commit_batch = Histogram(
+            "timemanager_group_commit_batch_size",
+            "Writes committed together by the group-commit writer.",
+            (),
+            BATCH_BUCKETS,
+        )
+        self.slow_queries = Counter(
+            "timemanager_sql_slow_queries_total", "Statements slower than the slow query threshold."
+        )
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, statements: int) -> None:
+        with self._lock:
+            self.request_duration.observe(seconds, method, route, str(status))
+            self.request_statements.observe(statements, method, route)
+
+    def observe_query(self, operation: str, seconds: float, slow: bool) -> None:
+        with self._lock:
+            self.query_duration.observe(seconds, operation)
+            if slow:
+                self.slow_queries.value += 1
+
+    def observe_group_commit(self, size: int) -> None:
+        with self._lock:
+            self.group_commit_batch.observe(size)
+
+    def state(self) -> dict:
+        with self._lock:
+            return {
+                "request_duration": self.request_duration.state(),
+                "request_statements": self.request_statements.state(),
+                "query_duration": self.query_duration.state(),
+                "group_commit_batch": self.group_commit_batch.state(),
+                "slow_queries": self.slow_queries.value,
+            }
+
+    def render(self, extra: Iterable[str] = ()) -> str:
+        others = shared.collect("metrics")
+        with self._lock:
+            lines = [
+                *self.request_duration.render(o["request_duration"] for o in others),
+                *self.request_statements.render(o["request_statements"] for o in others),
+                *self.query_duration.render(o["query_duration"] for o in others),
+                *self.group_commit_batch.render(o["group_commit_batch"] for o in others),
+                *self.slow_queries.render(o["slow_queries"] for o in others),
+            ]
+        return "\n".join([*lines, *extra]) + "\n"
+
+
+registry = Registry()
+shared.publish("metrics", registry.state)
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    sql_seconds: float = 0.0
+
+
+# Holds a mutable object so the counts survive the context copies made for
+# threadpool handlers and for the async engine's greenlets.
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += elapsed
+    slow = elapsed * 1000 >= settings.slow_query_ms
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    registry.observe_query(operation, elapsed, slow)
+    if slow:
+        params = repr(parameters)
+        if len(params) > MAX_LOGGED_PARAMS:
+            params = params[:MAX_LOGGED_PARAMS] + "..."
+        logger.warning("slow query (%.1f ms): %s; parameters: %s", elapsed * 1000, statement, params)
+
+
+def _handle_error(exception_context) -> None:
+    # A failed statement never reaches after_cursor_execute; drop its start time.
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument(engine: Engine) -> None:
+    """Time and count every statement executed through ``engine`` (use ``sync_engine`` for async engines)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed until their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.server_timing:
+                    total_ms = (time.perf_counter() - started) * 1000
+                    header = (
+                        f"app;dur={total_ms:.1f}, "
+                        f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.statements} statements"'
+                    )
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            route = scope.get("route")
+            registry.observe_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                time.perf_counter() - started,
+                stats.statements,
+            )
@@ -0,0 +1,272 @@
+"""Versioned schema migrations.
+
+Applied migrations are recorded in ``schema_migrations``; ``upgrade`` runs the
+pending ones in order, each in its own transaction. The baseline creates the
+schema as it stood when migrations were introduced, from its own frozen table
+definitions rather than the models, so every database starts from the same
+tables whatever the models look like today; the later migrations take it from
+there. Databases created before the baseline was pinned already have some of
+the newer objects, so migrations create and drop with existence checks.
+
+``upgrade`` holds a lock for its whole run (a PostgreSQL advisory lock, or a
+file lock next to a SQLite database), so workers that start together apply
+each migration once instead of racing to create the same tables.
+
+    python -m app.migrations upgrade
+    python -m app.migrations status
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator
+
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text, func, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import archive, models, rollup, search, shared
+
+# Arbitrary key for pg_advisory_lock, held while migrations run.
+PG_LOCK_KEY = 0x746D_6D67
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+# The schema migration 1 creates. Frozen: change the models and add a migration instead.
+_baseline_metadata = MetaData()
+
+Table(
+    "customers",
+    _baseline_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255), unique=True, nullable=False, index=True),
+    Column("contact_email", String(255), nullable=True),
+    Column("notes", Text, nullable=True),
+    Column("active", Boolean, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+Table(
+    "departments",
+    _baseline_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255), nullable=False, index=True),
+    Column("customer_id", ForeignKey("customers.id", ondelete="CASCADE"), nullable=False, index=True),
+)
+
+Table(
+    "projects",
+    _baseline_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255), nullable=False, index=True),
+    Column("customer_id", ForeignKey("customers.id", ondelete="RESTRICT"), nullable=False, index=True),
+    Column("department_id", ForeignKey("departments.id", ondelete="SET NULL"), nullable=True, index=True),
+    Column("active", Boolean, nullable=False),
+)
+
+Table(
+    "time_entries",
+    _baseline_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("project_id", ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+    Column("work_date", Date, nullable=False),
+    Column("hours", Float, nullable=False),
+    Column("description", Text, nullable=True),
+    Column("billable", Boolean, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Index("ix_time_entries_project_date", "project_id", "work_date", "hours", "billable"),
+    Index("ix_time_entries_work_date_id", "work_date", "id"),
+)
+
+Table(
+    "time_entry_rollups",
+    _baseline_metadata,
+    Column("project_id", ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True),
+    Column("work_date", Date, primary_key=True),
+    Column("billable", Boolean, primary_key=True),
+    Column("hours", Float, nullable=False),
+    Column("entry_count", Integer, nullable=False),
+    Index("ix_time_entry_rollups_date_project", "work_date", "project_id", "billable", "hours"),
+)
+
+
+def _baseline(conn: Connection) -> None:
+    _baseline_metadata.create_all(bind=conn)
+
+
+def _backfill_rollups(conn: Connection) -> None:
+    # Databases created before the rollup table existed have entries but no rollup rows.
+    has_entries = conn.scalar(select(models.TimeEntry.id).limit(1)) is not None
+    has_rollups = conn.scalar(select(models.TimeEntryRollup.project_id).limit(1)) is not None
+    if has_entries and not has_rollups:
+        rollup.rebuild(Session(bind=conn))
+
+
+def _composite_indexes(conn: Connection) -> None:
+    for name in ("ix_time_entries_project_id", "ix_time_entries_work_date", "ix_time_entry_rollups_work_date"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for table in (models.TimeEntry.__table__, models.TimeEntryRollup.__table__, models.Project.__table__, models.Department.__table__):
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _closed_periods(conn: Connection) -> None:
+    for table in (models.ClosedPeriod.__table__, models.PeriodSnapshot.__table__):
+        table.create(conn, checkfirst=True)
+
+
+def _changes(conn: Connection) -> None:
+    models.Change.__table__.create(conn, checkfirst=True)
+
+
+def _archives(conn: Connection) -> None:
+    models.ArchivedYear.__table__.create(conn, checkfirst=True)
+
+
+def _entry_ids_autoincrement(conn: Connection) -> None:
+    # SQLite reuses the highest rowid once its row is gone, e.g. moved to an archive table.
+    if conn.dialect.name != "sqlite":
+        return
+    hot = models.TimeEntry.__table__
+    sql = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'time_entries'"))
+    if "AUTOINCREMENT" not in sql.upper():
+        conn.execute(text("ALTER TABLE time_entries RENAME TO time_entries_old"))
+        # The rename took the search triggers and the indexes along; the new table gets fresh ones.
+        for trigger in ("time_entries_fts_ai", "time_entries_fts_ad", "time_entries_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        for index in hot.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        hot.create(conn)
+        names = ", ".join(c.name for c in hot.columns)
+        conn.execute(text(f"INSERT INTO time_entries ({names}) SELECT {names} FROM time_entries_old"))
+        conn.execute(text("DROP TABLE time_entries_old"))
+        search.create_index(conn)
+    years = conn.scalars(select(models.ArchivedYear.year)).all()
+    top = max(
+        [conn.scalar(select(func.max(table.c.id))) or 0 for table in (hot, *(archive.archive_table(y) for y in years))]
+    )
+    if not conn.execute(text("UPDATE sqlite_sequence SET seq = max(seq, :top) WHERE name = 'time_entries'"), {"top": top}).rowcount:
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('time_entries', :top)"), {"top": top})
+
+
+def _archive_search(conn: Connection) -> None:
+    # Years archived before archive tables got their own search index.
+    for year in conn.scalars(select(models.ArchivedYear.year)).all():
+        search.index_archive(conn, archive.archive_table(year).name)
+
+
+def _snapshot_project_index(conn: Connection) -> None:
+    for index in models.PeriodSnapshot.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _change_seq_autoincrement(conn: Connection) -> None:
+    # Without AUTOINCREMENT, pruning the newest changes let SQLite hand their seqs out again.
+    if conn.dialect.name != "sqlite":
+        return
+    table = models.Change.__table__
+    sql = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'changes'"))
+    if "AUTOINCREMENT" in sql.upper():
+        return
+    conn.execute(text("ALTER TABLE changes RENAME TO changes_old"))
+    for index in table.indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    table.create(conn)
+    names = ", ".join(c.name for c in table.columns)
+    conn.execute(text(f"INSERT INTO changes ({names}) SELECT {names} FROM changes_old"))
+    conn.execute(text("DROP TABLE changes_old"))
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline", _baseline),
+    (2, "backfill_rollups", _backfill_rollups),
+    (3, "composite_indexes", _composite_indexes),
+    (4, "search_index", search.create_index),
+    (5, "closed_periods", _closed_periods),
+    (6, "changes", _changes),
+    (7, "time_entry_archives", _archives),
+    (8, "entry_ids_autoincrement", _entry_ids_autoincrement),
+    (9, "archive_search", _archive_search),
+    (10, "snapshot_project_index", _snapshot_project_index),
+    (11, "change_seq_autoincrement", _change_seq_autoincrement),
+]
+
+
+def applied_versions(conn: Connection) -> set[int]:
+    _metadata.create_all(bind=conn)
+    return set(conn.scalars(select(schema_migrations.c.version)))
+
+
+@contextmanager
+def _exclusive(engine: Engine) -> Iterator[None]:
+    """Keep other processes out of ``upgrade`` until the block exits."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": PG_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PG_LOCK_KEY})
+        return
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:" or shared.fcntl is None:
+        yield
+        return
+    fd = os.open(f"{database}.migrate-lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        shared.lock(fd)
+        yield
+    finally:
+        os.close(fd)
+
+
+def upgrade(engine: Engine) -> list[str]:
+    """Apply pending migrations and return the names of those that ran."""
+    with _exclusive(engine):
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        ran = []
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            with engine.begin() as conn:
+                migrate(conn)
+                conn.execute(schema_migrations.insert().values(version=version, name=name))
+            ran.append(name)
+    return ran
+
+
+def main(argv: list[str] | None = None) -> int:
+    from .database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["upgrade", "status"])
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        ran = upgrade(engine)
+        print("\n".join(f"applied {name}" for name in ran) or "up to date")
+        return 0
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+        conn.commit()
+    for version, name, _ in MIGRATIONS:
+        print(f"{version:4} {name:30} {'applied' if version in done else 'pending'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
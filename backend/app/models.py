@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime, date
 from typing import Optional
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Date, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Date, Text, Index, JSON
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 from .database import Base
@@ -19,41 +19,61 @@ class Customer(Base):
     active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
-    departments: Mapped[list[Department]] = relationship("Department", back_populates="customer", cascade="all, delete-orphan")
-    projects: Mapped[list[Project]] = relationship("Project", back_populates="customer")
+    departments: Mapped[list[Department]] = relationship(
+        "Department", back_populates="customer", cascade="all, delete-orphan", passive_deletes=True
+    )
+    # projects.customer_id is ON DELETE RESTRICT: a customer with projects cannot be deleted.
+    projects: Mapped[list[Project]] = relationship("Project", back_populates="customer", passive_deletes="all")
 
 
 class Department(Base):
     __tablename__ = "departments"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     customer_id: Mapped[int] = mapped_column(ForeignKey("customers.id", ondelete="CASCADE"), nullable=False, index=True)
 
     customer: Mapped[Customer] = relationship("Customer", back_populates="departments")
-    projects: Mapped[list[Project]] = relationship("Project", back_populates="department")
+    projects: Mapped[list[Project]] = relationship("Project", back_populates="department", passive_deletes=True)
 
 
 class Project(Base):
     __tablename__ = "projects"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     customer_id: Mapped[int] = mapped_column(ForeignKey("customers.id", ondelete="RESTRICT"), nullable=False, index=True)
     department_id: Mapped[Optional[int]] = mapped_column(ForeignKey("departments.id", ondelete="SET NULL"), nullable=True, index=True)
     active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
 
     customer: Mapped[Customer] = relationship("Customer", back_populates="projects")
     department: Mapped[Optional[Department]] = relationship("Department", back_populates="projects")
-    time_entries: Mapped[list[TimeEntry]] = relationship("TimeEntry", back_populates="project", cascade="all, delete-orphan")
+    time_entries: Mapped[list[TimeEntry]] = relationship(
+        "TimeEntry", back_populates="project", cascade="all, delete-orphan", passive_deletes=True
+    )
+    rollups: Mapped[list[TimeEntryRollup]] = relationship(
+        "TimeEntryRollup", back_populates="project", cascade="all, delete-orphan", passive_deletes=True
+    )
+    snapshots: Mapped[list[PeriodSnapshot]] = relationship(
+        "PeriodSnapshot", back_populates="project", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class TimeEntry(Base):
     __tablename__ = "time_entries"
+    __table_args__ = (
+        # Covers project-filtered listings and per-project date-range sums without touching the table.
+        Index("ix_time_entries_project_date", "project_id", "work_date", "hours", "billable"),
+        # Matches the (work_date desc, id desc) listing order and its keyset cursor.
+        Index("ix_time_entries_work_date_id", "work_date", "id"),
+        # Ids of rows moved to the archive tables must not be handed out again (PostgreSQL's
+        # sequence never reuses them; SQLite would without AUTOINCREMENT).
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
-    work_date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    work_date: Mapped[date] = mapped_column(Date, nullable=False)
     hours: Mapped[float] = mapped_column(Float, nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     billable: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
@@ -61,3 +81,81 @@ class TimeEntry(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     project: Mapped[Project] = relationship("Project", back_populates="time_entries")
+
+
+class TimeEntryRollup(Base):
+    """Hours per (project, work_date, billable), kept in step with time_entries by the router."""
+
+    __tablename__ = "time_entry_rollups"
+    __table_args__ = (
+        # Date-range reports read every column they need from this index.
+        Index("ix_time_entry_rollups_date_project", "work_date", "project_id", "billable", "hours"),
+    )
+
+    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    work_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    billable: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+    hours: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    entry_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    project: Mapped[Project] = relationship("Project", back_populates="rollups")
+
+
+class ClosedPeriod(Base):
+    """A locked month; entries dated inside it can no longer be created, changed or deleted."""
+
+    __tablename__ = "closed_periods"
+
+    # First day of the month.
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+    closed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+    snapshots: Mapped[list[PeriodSnapshot]] = relationship(
+        "PeriodSnapshot", back_populates="period", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+class PeriodSnapshot(Base):
+    """Hours per (closed month, project, billable), frozen from the rollup when the month was closed."""
+
+    __tablename__ = "period_snapshots"
+    __table_args__ = (
+        # A project's closed months: the project delete check and its ON DELETE CASCADE.
+        Index("ix_period_snapshots_project_month", "project_id", "month"),
+    )
+
+    month: Mapped[date] = mapped_column(ForeignKey("closed_periods.month", ondelete="CASCADE"), primary_key=True)
+    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    billable: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+    hours: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    entry_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    period: Mapped[ClosedPeriod] = relationship("ClosedPeriod", back_populates="snapshots")
+    project: Mapped[Project] = relationship("Project", back_populates="snapshots")
+
+
+class Change(Base):
+    """One row per committed write to a time entry, project or customer, in commit order."""
+
+    __tablename__ = "changes"
+    # A pruned seq must not be handed out again, or clients resuming from it would skip
+    # the changes that reuse it (SQLite reuses the highest rowid without AUTOINCREMENT).
+    __table_args__ = ({"sqlite_autoincrement": True},)
+
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    entity: Mapped[str] = mapped_column(String(32), nullable=False)
+    op: Mapped[str] = mapped_column(String(16), nullable=False)
+    entity_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # The row as the API returns it after the change; NULL for deletes.
+    data: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class ArchivedYear(Base):
+    """A year whose entries were moved from time_entries into their own table (see app.archive)."""
+
+    __tablename__ = "time_entry_archives"
+
+    year: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    entry_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
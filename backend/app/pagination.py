@@ -0,0 +1,109 @@
+"""Keyset (cursor) pagination for the ``/page`` list endpoints.
+
+A cursor encodes the sort key of the last row returned, so the next page is a
+range seek on the ordering columns instead of an OFFSET that has to walk and
+discard every earlier row.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute, Session
+
+from . import schemas
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, date) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[InstrumentedAttribute]) -> list[Any]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise ValueError(cursor)
+        values = []
+        for column, value in zip(columns, raw):
+            python_type = column.type.python_type
+            values.append(python_type.fromisoformat(value) if python_type is date else python_type(value))
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _keyset_select(
+    stmt: Select,
+    columns: Sequence[InstrumentedAttribute],
+    cursor: Optional[str],
+    limit: int,
+    descending: bool,
+) -> Select:
+    if cursor:
+        after = tuple_(*decode_cursor(cursor, columns))
+        stmt = stmt.where(tuple_(*columns) < after if descending else tuple_(*columns) > after)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return stmt.order_by(*order).limit(limit + 1)
+
+
+def _selects_entity(stmt: Select) -> bool:
+    # select(Model) pages return entities; select(Model.a, Model.b, ...) pages return rows.
+    descriptions = stmt.column_descriptions
+    return len(descriptions) == 1 and isinstance(descriptions[0]["expr"], type)
+
+
+def _count_select(stmt: Select) -> Select:
+    return select(func.count()).select_from(stmt.order_by(None).subquery())
+
+
+def _page(rows: Sequence[Any], columns: Sequence[InstrumentedAttribute], limit: int, total: Optional[int]) -> dict:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    return {
+        "items": rows,
+        "pagination": schemas.Pagination(total=total, limit=limit, next_cursor=next_cursor),
+    }
+
+
+def keyset_page(
+    db: Session,
+    stmt: Select,
+    columns: Sequence[InstrumentedAttribute],
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+    include_total: bool = False,
+) -> dict:
+    """Return ``{"items", "pagination"}`` for the page of ``stmt`` following ``cursor``.
+
+    ``stmt`` selects either an entity (items are instances) or columns that include
+    the ordering ``columns`` (items are rows).
+    """
+    total = db.scalar(_count_select(stmt)) if include_total else None
+    result = db.execute(_keyset_select(stmt, columns, cursor, limit, descending))
+    rows = result.scalars().all() if _selects_entity(stmt) else result.all()
+    return _page(rows, columns, limit, total)
+
+
+async def keyset_page_async(
+    db: AsyncSession,
+    stmt: Select,
+    columns: Sequence[InstrumentedAttribute],
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+    include_total: bool = False,
+) -> dict:
+    """``keyset_page`` for an ``AsyncSession``."""
+    total = await db.scalar(_count_select(stmt)) if include_total else None
+    result = await db.execute(_keyset_select(stmt, columns, cursor, limit, descending))
+    rows = result.scalars().all() if _selects_entity(stmt) else result.all()
+    return _page(rows, columns, limit, total)
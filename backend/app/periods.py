@@ -0,0 +1,154 @@
+"""Closed (locked) months and their frozen report totals.
+
+Closing a month copies its per-(project, billable) totals from the rollup into
+``period_snapshots`` and records it in ``closed_periods``. From then on the
+time entry endpoints refuse to create, move, change or delete entries dated in
+that month, so the snapshot stays exact. The report endpoints read closed
+months that lie entirely inside the requested range from the snapshots (one
+row per project instead of one per project and day) and only aggregate the
+rollup for the remaining, open days.
+
+Like ``app.rollup`` these functions take a sync ``Session``; async handlers call
+them through ``AsyncSession.run_sync``.
+
+A write checks ``ensure_open`` and ``close`` takes its snapshot under ``lock``,
+held to the end of their transactions, so a write that found its month open
+commits before the snapshot is taken or waits and then finds the month closed.
+"""
+from __future__ import annotations
+
+import calendar
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, func, insert, literal, not_, or_, select, text, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Arbitrary key for pg_advisory_xact_lock(_shared); writes share it, closing a month takes it alone.
+PG_LOCK_KEY = 0x746D_7064
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def parse_month(value: str) -> date:
+    """``YYYY-MM`` to the first day of that month."""
+    try:
+        year, month = value.split("-")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid month {value!r}; expected YYYY-MM")
+
+
+def lock(db: Session, exclusive: bool = False) -> None:
+    """Hold off ``close`` (or, ``exclusive``, the writes) until this transaction ends."""
+    if db.get_bind().dialect.name == "postgresql":
+        function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+        db.execute(text(f"SELECT {function}(:key)"), {"key": PG_LOCK_KEY})
+    else:
+        # SQLite has one writer at a time: a write statement, even one that matches no
+        # row, takes the database's write lock until commit.
+        db.execute(text("UPDATE closed_periods SET month = month WHERE 0"))
+
+
+def ensure_open(db: Session, days: Iterable[date]) -> None:
+    """Raise 409 if any of ``days`` falls in a closed month."""
+    lock(db)
+    months = {month_start(day) for day in days}
+    closed = db.scalars(select(models.ClosedPeriod.month).where(models.ClosedPeriod.month.in_(months))).first()
+    if closed is not None:
+        raise HTTPException(status_code=409, detail=f"Period {closed:%Y-%m} is closed")
+
+
+def close(db: Session, month: date) -> models.ClosedPeriod:
+    """Lock ``month`` and snapshot its totals from the rollup."""
+    if db.get(models.ClosedPeriod, month) is not None:
+        raise HTTPException(status_code=409, detail=f"Period {month:%Y-%m} is already closed")
+    if month >= month_start(date.today()):
+        raise HTTPException(status_code=400, detail="Only past months can be closed")
+    lock(db, exclusive=True)
+    period = models.ClosedPeriod(month=month)
+    db.add(period)
+    db.flush()
+    rollup = models.TimeEntryRollup
+    totals = (
+        select(
+            literal(month, models.PeriodSnapshot.month.type),
+            rollup.project_id,
+            rollup.billable,
+            func.sum(rollup.hours),
+            func.sum(rollup.entry_count),
+        )
+        .where(rollup.work_date >= month, rollup.work_date < next_month(month))
+        .group_by(rollup.project_id, rollup.billable)
+    )
+    snapshot = models.PeriodSnapshot
+    db.execute(
+        insert(snapshot).from_select(
+            [snapshot.month, snapshot.project_id, snapshot.billable, snapshot.hours, snapshot.entry_count], totals
+        )
+    )
+    return period
+
+
+def reopen(db: Session, month: date) -> None:
+    if db.get(models.ArchivedYear, month.year) is not None:
+        raise HTTPException(status_code=409, detail=f"Period {month:%Y-%m} is archived; unarchive {month.year} first")
+    # The snapshots go with it (ON DELETE CASCADE).
+    stmt = delete(models.ClosedPeriod).where(models.ClosedPeriod.month == month).returning(models.ClosedPeriod.month)
+    if db.scalar(stmt) is None:
+        raise HTTPException(status_code=404, detail=f"Period {month:%Y-%m} is not closed")
+
+
+def _spans(months: list[date]) -> list[tuple[date, date]]:
+    """Merge sorted months into ``[start, end)`` date ranges of consecutive months."""
+    spans: list[tuple[date, date]] = []
+    for month in months:
+        if spans and spans[-1][1] == month:
+            spans[-1] = (spans[-1][0], next_month(month))
+        else:
+            spans.append((month, next_month(month)))
+    return spans
+
+
+def hours_source(db: Session, from_date: Optional[date], to_date: Optional[date]):
+    """Subquery of ``(project_id, billable, hours)`` rows covering ``[from_date, to_date]``.
+
+    Closed months entirely inside the range come from the snapshots, every other
+    day from the rollup; summing ``hours`` over it gives the same totals as
+    summing the rollup alone.
+    """
+    rollup = models.TimeEntryRollup
+    snapshot = models.PeriodSnapshot
+    stmt = select(models.ClosedPeriod.month).order_by(models.ClosedPeriod.month)
+    if from_date is not None:
+        stmt = stmt.where(models.ClosedPeriod.month >= from_date)
+    if to_date is not None:
+        # The whole month has to be inside the range.
+        if to_date.day == calendar.monthrange(to_date.year, to_date.month)[1]:
+            stmt = stmt.where(models.ClosedPeriod.month <= month_start(to_date))
+        else:
+            stmt = stmt.where(models.ClosedPeriod.month < month_start(to_date))
+    spans = _spans(list(db.scalars(stmt)))
+
+    live = select(rollup.project_id, rollup.billable, rollup.hours)
+    if from_date is not None:
+        live = live.where(rollup.work_date >= from_date)
+    if to_date is not None:
+        live = live.where(rollup.work_date <= to_date)
+    if not spans:
+        return live.subquery("hours_source")
+    for start, end in spans:
+        live = live.where(not_(and_(rollup.work_date >= start, rollup.work_date < end)))
+    frozen = select(snapshot.project_id, snapshot.billable, snapshot.hours).where(
+        or_(*(and_(snapshot.month >= start, snapshot.month < end) for start, end in spans))
+    )
+    return union_all(live, frozen).subquery("hours_source")
@@ -0,0 +1,97 @@
+"""Per-client token buckets on the write routes.
+
+Every client has a bucket of ``write_rate_burst`` tokens that refills at
+``write_rate_limit`` tokens per second. A POST, PUT, PATCH or DELETE takes one
+token; with the bucket empty the request is refused with 429 and a
+``Retry-After`` header before it reaches the handlers, so a client retrying in
+a tight loop cannot keep the database's writer busy for everyone else.
+
+Clients are told apart by ``rate_limit_client_header`` when it is set (the
+first address of ``X-Forwarded-For`` behind a proxy, or a client id the apps
+send), otherwise by their address. Buckets are per process: with several
+workers a client gets up to that many times the limit.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import orjson
+
+from .config import settings
+
+METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+# Clients tracked at once; the least recently seen are dropped first. A dropped
+# client starts over with a full bucket, which is what its bucket would have
+# refilled to anyway unless it was seen within the last burst / rate seconds.
+MAX_CLIENTS = 10_000
+
+
+class TokenBuckets:
+    def __init__(self, rate: float, burst: int, max_clients: int = MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        # client -> (tokens, monotonic time of the last refill)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, client: str) -> Optional[float]:
+        """Take a token for ``client``; ``None`` if granted, else the seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                wait = None
+            else:
+                self._buckets[client] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            self._buckets.move_to_end(client)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+def client_id(scope) -> str:
+    header = settings.rate_limit_client_header
+    if header:
+        value = dict(scope["headers"]).get(header.lower().encode("latin-1"))
+        if value:
+            return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware that answers 429 once a client's bucket is empty."""
+
+    def __init__(self, app, buckets: TokenBuckets | None = None):
+        self.app = app
+        self.buckets = buckets or TokenBuckets(settings.write_rate_limit, settings.write_rate_burst)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METHODS:
+            await self.app(scope, receive, send)
+            return
+        wait = self.buckets.take(client_id(scope))
+        if wait is None:
+            await self.app(scope, receive, send)
+            return
+        body = orjson.dumps({"detail": "Too many write requests; retry later"})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(math.ceil(wait)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
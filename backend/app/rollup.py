@@ -0,0 +1,196 @@
+"""Daily hour rollups behind the report endpoints.
+
+``time_entry_rollups`` holds one row per (project, work_date, billable) with the
+summed hours and the number of entries contributing to it. The time entry
+router applies a delta for every create, update and delete so the reports can
+aggregate the (much smaller) rollup instead of every entry.
+
+Run ``python -m app.rollup rebuild`` to recompute the table from scratch and
+``python -m app.rollup verify`` to compare it against ``time_entries``.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, Mapping, NamedTuple, Protocol
+
+from sqlalchemy import delete, func, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import archive, models
+
+TOLERANCE = 1e-6
+
+
+class EntryLike(Protocol):
+    project_id: int
+    work_date: date
+    hours: float
+    billable: bool
+
+
+class EntryValues(NamedTuple):
+    """The rollup-relevant fields of an entry, captured before it is changed."""
+
+    project_id: int
+    work_date: date
+    hours: float
+    billable: bool
+
+    @classmethod
+    def of(cls, entry: EntryLike) -> EntryValues:
+        return cls(entry.project_id, entry.work_date, entry.hours, bool(entry.billable))
+
+
+def _insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        return pg_insert(models.TimeEntryRollup)
+    return sqlite_insert(models.TimeEntryRollup)
+
+
+def _upsert_stmt(db: Session):
+    rollup = models.TimeEntryRollup
+    stmt = _insert(db)
+    return stmt.on_conflict_do_update(
+        index_elements=[rollup.project_id, rollup.work_date, rollup.billable],
+        set_={
+            "hours": rollup.hours + stmt.excluded.hours,
+            "entry_count": rollup.entry_count + stmt.excluded.entry_count,
+        },
+    )
+
+
+def apply_delta(db: Session, project_id: int, work_date: date, billable: bool, hours: float, count: int) -> None:
+    """Add ``hours``/``count`` to one rollup bucket, creating or dropping the row as needed."""
+    rollup = models.TimeEntryRollup
+    db.execute(
+        _upsert_stmt(db),
+        {"project_id": project_id, "work_date": work_date, "billable": billable, "hours": hours, "entry_count": count},
+    )
+    if count < 0:
+        db.execute(
+            delete(rollup).where(
+                rollup.project_id == project_id,
+                rollup.work_date == work_date,
+                rollup.billable == billable,
+                rollup.entry_count <= 0,
+            )
+        )
+
+
+def add_many(db: Session, entries: Iterable[EntryLike | Mapping]) -> None:
+    """Fold a batch of new entries into the rollup with one executemany upsert."""
+    buckets: dict[tuple, list] = defaultdict(lambda: [0.0, 0])
+    for entry in entries:
+        if isinstance(entry, Mapping):
+            key = (entry["project_id"], entry["work_date"], bool(entry["billable"]))
+            hours = entry["hours"]
+        else:
+            key = (entry.project_id, entry.work_date, bool(entry.billable))
+            hours = entry.hours
+        buckets[key][0] += hours
+        buckets[key][1] += 1
+    if not buckets:
+        return
+    db.execute(
+        _upsert_stmt(db),
+        [
+            {"project_id": p, "work_date": d, "billable": b, "hours": hours, "entry_count": count}
+            for (p, d, b), (hours, count) in buckets.items()
+        ],
+    )
+
+
+def add_entry(db: Session, entry: EntryLike) -> None:
+    apply_delta(db, entry.project_id, entry.work_date, bool(entry.billable), entry.hours, 1)
+
+
+def remove_entry(db: Session, entry: EntryLike) -> None:
+    apply_delta(db, entry.project_id, entry.work_date, bool(entry.billable), -entry.hours, -1)
+
+
+def move_entry(db: Session, before: EntryLike, after: EntryLike) -> None:
+    """Apply an edit; one upsert (or none) when the entry stays in the same bucket."""
+    old, new = EntryValues.of(before), EntryValues.of(after)
+    if (old.project_id, old.work_date, old.billable) != (new.project_id, new.work_date, new.billable):
+        remove_entry(db, old)
+        add_entry(db, new)
+    elif old.hours != new.hours:
+        apply_delta(db, new.project_id, new.work_date, new.billable, new.hours - old.hours, 0)
+
+
+def _aggregate_entries(db: Session):
+    # Archived years count too: the rollup covers every entry, hot or cold.
+    tables = archive.all_entries(db)
+    if len(tables) == 1:
+        entry = tables[0]
+    else:
+        entry = union_all(*(select(t.c.id, t.c.project_id, t.c.work_date, t.c.billable, t.c.hours) for t in tables)).subquery()
+    return select(
+        entry.c.project_id,
+        entry.c.work_date,
+        entry.c.billable,
+        func.sum(entry.c.hours).label("hours"),
+        func.count(entry.c.id).label("entry_count"),
+    ).group_by(entry.c.project_id, entry.c.work_date, entry.c.billable)
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every rollup row from ``time_entries`` and the archive tables. Returns the number of rows written."""
+    rollup = models.TimeEntryRollup
+    db.execute(delete(rollup))
+    source = _aggregate_entries(db)
+    db.execute(
+        rollup.__table__.insert().from_select(
+            ["project_id", "work_date", "billable", "hours", "entry_count"], source
+        )
+    )
+    return db.scalar(select(func.count()).select_from(rollup)) or 0
+
+
+def verify(db: Session) -> list[str]:
+    """Return a description of every bucket where the rollup disagrees with ``time_entries``."""
+    expected = {
+        (r.project_id, r.work_date, bool(r.billable)): (float(r.hours), r.entry_count)
+        for r in db.execute(_aggregate_entries(db))
+    }
+    rollup = models.TimeEntryRollup
+    actual = {
+        (r.project_id, r.work_date, bool(r.billable)): (float(r.hours), r.entry_count)
+        for r in db.execute(select(rollup.project_id, rollup.work_date, rollup.billable, rollup.hours, rollup.entry_count))
+    }
+    problems = []
+    for key in sorted(expected.keys() | actual.keys()):
+        want = expected.get(key)
+        got = actual.get(key)
+        if want is None or got is None or want[1] != got[1] or abs(want[0] - got[0]) > TOLERANCE:
+            problems.append(f"project={key[0]} date={key[1]} billable={key[2]}: expected {want}, found {got}")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.rollup", description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        if args.command == "rebuild":
+            rows = rebuild(db)
+            db.commit()
+            print(f"rebuilt {rows} rollup rows")
+            return 0
+        problems = verify(db)
+        for line in problems:
+            print(line)
+        print(f"{len(problems)} mismatched buckets")
+        return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
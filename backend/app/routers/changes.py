@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..changes import as_dict, feed, last_seq, pruned_after, since as changes_since
+from ..config import settings
+from ..database import AsyncSessionLocal, get_async_db
+from ..serialization import dumps, json_response
+from .. import schemas
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+
+@router.get("/", response_model=List[schemas.ChangeOut])
+async def list_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Changes with ``seq`` greater than ``since``, oldest first; pass the last ``seq`` back to continue.
+
+    410 if changes after ``since`` were pruned: the client has to reload its data.
+    """
+    if since and await pruned_after(db, since):
+        raise HTTPException(status_code=410, detail=f"Changes after seq {since} were pruned; reload")
+    return json_response([as_dict(change) for change in await changes_since(db, since, limit)])
+
+
+def _event(change: dict) -> bytes:
+    return b"id: %d\nevent: change\ndata: %s\n\n" % (change["seq"], dumps(change))
+
+
+async def _events(request: Request, start: Optional[int]) -> AsyncIterator[bytes]:
+    subscriber = await feed.subscribe()
+    try:
+        async with AsyncSessionLocal() as db:
+            if start is None:
+                start = await last_seq(db)
+                backlog = []
+            elif start and await pruned_after(db, start):
+                backlog = None
+            else:
+                backlog = await changes_since(db, start, limit=settings.change_stream_buffer + 1)
+        if backlog is None or len(backlog) > settings.change_stream_buffer:
+            # Pruned past it, or too far behind to replay here; the client should reload.
+            yield b"event: reset\ndata: {}\n\n"
+            return
+        last = start
+        for change in backlog:
+            yield _event(as_dict(change))
+            last = change.seq
+        while not await request.is_disconnected():
+            try:
+                await asyncio.wait_for(subscriber.ready.wait(), timeout=settings.change_keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            batch = subscriber.take()
+            if subscriber.overflowed:
+                yield b"event: reset\ndata: {}\n\n"
+                return
+            for change in batch:
+                if change["seq"] > last:
+                    yield _event(change)
+                    last = change["seq"]
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(default=None, ge=0),
+    last_event_id: Optional[str] = Header(default=None),
+):
+    """Server-sent events, one ``change`` event per committed write.
+
+    Starts after ``since`` (or the ``Last-Event-ID`` a reconnecting ``EventSource``
+    sends), otherwise at the current end of the log. A ``reset`` event means the
+    client fell too far behind, or its changes were pruned, and should reload its data.
+    """
+    start = since
+    if start is None and last_event_id is not None:
+        if not last_event_id.isdigit():
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a change seq")
+        start = int(last_event_id)
+    return StreamingResponse(
+        _events(request, start),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
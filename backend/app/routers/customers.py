@@ -2,69 +2,119 @@ from __future__ import annotations
 
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from .. import models, schemas
+from ..cache import response_cache
+from ..database import get_async_db, get_async_write_db
+from ..errors import constraint_errors
+from ..pagination import keyset_page_async
+from ..serialization import dumps, json_response, row_dicts, schema_columns
+from .. import changes, models, schemas
+from ..search import customer_name_filter
 
 router = APIRouter(prefix="/customers", tags=["customers"])
 
+CUSTOMER_COLUMNS = schema_columns(models.Customer, schemas.CustomerOut)
+
+
+def _filtered_customers(dialect: str, search: Optional[str], active: Optional[bool]):
+    stmt = select(*CUSTOMER_COLUMNS)
+    if search:
+        stmt = stmt.where(customer_name_filter(dialect, search))
+    if active is not None:
+        stmt = stmt.where(models.Customer.active == active)
+    return stmt
+
 
 @router.get("/", response_model=List[schemas.CustomerOut])
-def list_customers(
+async def list_customers(
+    request: Request,
     skip: int = 0,
     limit: int = Query(1000, le=10000),
     search: Optional[str] = None,
     active: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = db.query(models.Customer)
-    if search:
-        like = f"%{search}%"
-        query = query.filter(models.Customer.name.ilike(like))
-    if active is not None:
-        query = query.filter(models.Customer.active == active)
-    return query.order_by(models.Customer.name.asc()).offset(skip).limit(limit).all()
+    lookup = response_cache.lookup(request, "customers")
+    if (cached := lookup.cached()) is not None:
+        return cached
+    stmt = _filtered_customers(db.bind.dialect.name, search, active)
+    result = await db.execute(stmt.order_by(models.Customer.name.asc()).offset(skip).limit(limit))
+    return lookup.store(dumps(row_dicts(result.all())))
+
+
+@router.get("/page", response_model=schemas.Page[schemas.CustomerOut])
+async def page_customers(
+    search: Optional[str] = None,
+    active: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    stmt = _filtered_customers(db.bind.dialect.name, search, active)
+    page = await keyset_page_async(
+        db, stmt, (models.Customer.name, models.Customer.id), cursor, limit, include_total=include_total
+    )
+    return json_response({**page, "items": row_dicts(page["items"])})
 
 
 @router.post("/", response_model=schemas.CustomerOut, status_code=201)
-def create_customer(payload: schemas.CustomerCreate, db: Session = Depends(get_db)):
-    exists = db.query(models.Customer).filter(models.Customer.name == payload.name).first()
-    if exists:
-        raise HTTPException(status_code=400, detail="Customer name already exists")
-    customer = models.Customer(**payload.model_dump())
-    db.add(customer)
-    db.commit()
-    db.refresh(customer)
-    return customer
+async def create_customer(payload: schemas.CustomerCreate, db: AsyncSession = Depends(get_async_write_db)):
+    stmt = insert(models.Customer).values(**payload.model_dump()).returning(*CUSTOMER_COLUMNS)
+    with constraint_errors(unique=(400, "Customer name already exists")):
+        customer = (await db.execute(stmt)).one()._asdict()
+    changes.record(db, "customer", "create", customer)
+    await db.commit()
+    response_cache.invalidate("customers")
+    return json_response(customer, status_code=201)
 
 
 @router.get("/{customer_id}", response_model=schemas.CustomerOut)
-def get_customer(customer_id: int, db: Session = Depends(get_db)):
-    customer = db.get(models.Customer, customer_id)
+async def get_customer(customer_id: int, db: AsyncSession = Depends(get_async_db)):
+    customer = await db.get(models.Customer, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
 
 
 @router.put("/{customer_id}", response_model=schemas.CustomerOut)
-def update_customer(customer_id: int, payload: schemas.CustomerUpdate, db: Session = Depends(get_db)):
-    customer = db.get(models.Customer, customer_id)
-    if not customer:
+async def update_customer(
+    customer_id: int, payload: schemas.CustomerUpdate, db: AsyncSession = Depends(get_async_write_db)
+):
+    data = payload.model_dump(exclude_unset=True)
+    if data:
+        stmt = (
+            update(models.Customer)
+            .where(models.Customer.id == customer_id)
+            .values(**data)
+            .returning(*CUSTOMER_COLUMNS)
+        )
+    else:
+        stmt = select(*CUSTOMER_COLUMNS).where(models.Customer.id == customer_id)
+    with constraint_errors(unique=(400, "Customer name already exists")):
+        row = (await db.execute(stmt)).one_or_none()
+    if row is None:
         raise HTTPException(status_code=404, detail="Customer not found")
-    for key, value in payload.model_dump(exclude_unset=True).items():
-        setattr(customer, key, value)
-    db.commit()
-    db.refresh(customer)
-    return customer
+    customer = row._asdict()
+    if data:
+        changes.record(db, "customer", "update", customer)
+        await db.commit()
+        response_cache.invalidate("customers")
+    return json_response(customer)
 
 
 @router.delete("/{customer_id}", status_code=204)
-def delete_customer(customer_id: int, db: Session = Depends(get_db)):
-    customer = db.get(models.Customer, customer_id)
-    if not customer:
+async def delete_customer(customer_id: int, db: AsyncSession = Depends(get_async_write_db)):
+    # Departments go with the customer (ON DELETE CASCADE); projects block it (RESTRICT).
+    stmt = delete(models.Customer).where(models.Customer.id == customer_id).returning(models.Customer.id)
+    with constraint_errors(foreign_key=(409, "Customer still has projects")):
+        deleted = await db.scalar(stmt)
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Customer not found")
-    db.delete(customer)
-    db.commit()
+    changes.record(db, "customer", "delete", entity_id=customer_id)
+    await db.commit()
+    response_cache.invalidate("customers", "departments")
     return None
@@ -2,57 +2,98 @@ from __future__ import annotations
 
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..cache import response_cache
+from ..database import get_async_write_db, get_db
+from ..errors import constraint_errors
+from ..pagination import keyset_page
+from ..serialization import dumps, json_response, row_dicts, schema_columns
 from .. import models, schemas
 
 router = APIRouter(prefix="/departments", tags=["departments"])
 
+DEPARTMENT_COLUMNS = schema_columns(models.Department, schemas.DepartmentOut)
+
+
+def _filtered_departments(customer_id: int | None):
+    stmt = select(*DEPARTMENT_COLUMNS)
+    if customer_id is not None:
+        stmt = stmt.where(models.Department.customer_id == customer_id)
+    return stmt
+
 
 @router.get("/", response_model=List[schemas.DepartmentOut])
 def list_departments(
+    request: Request,
     customer_id: int | None = None,
     skip: int = 0,
     limit: int = Query(1000, le=10000),
     db: Session = Depends(get_db),
 ):
-    query = db.query(models.Department)
-    if customer_id is not None:
-        query = query.filter(models.Department.customer_id == customer_id)
-    return query.order_by(models.Department.name.asc()).offset(skip).limit(limit).all()
+    lookup = response_cache.lookup(request, "departments")
+    if (cached := lookup.cached()) is not None:
+        return cached
+    stmt = _filtered_departments(customer_id)
+    rows = db.execute(stmt.order_by(models.Department.name.asc()).offset(skip).limit(limit)).all()
+    return lookup.store(dumps(row_dicts(rows)))
+
+
+@router.get("/page", response_model=schemas.Page[schemas.DepartmentOut])
+def page_departments(
+    customer_id: int | None = None,
+    cursor: str | None = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+):
+    stmt = _filtered_departments(customer_id)
+    page = keyset_page(db, stmt, (models.Department.name, models.Department.id), cursor, limit, include_total=include_total)
+    return json_response({**page, "items": row_dicts(page["items"])})
 
 
 @router.post("/", response_model=schemas.DepartmentOut, status_code=201)
-def create_department(payload: schemas.DepartmentCreate, db: Session = Depends(get_db)):
-    customer = db.get(models.Customer, payload.customer_id)
-    if not customer:
-        raise HTTPException(status_code=400, detail="Customer does not exist")
-    department = models.Department(**payload.model_dump())
-    db.add(department)
-    db.commit()
-    db.refresh(department)
-    return department
+async def create_department(payload: schemas.DepartmentCreate, db: AsyncSession = Depends(get_async_write_db)):
+    stmt = insert(models.Department).values(**payload.model_dump()).returning(*DEPARTMENT_COLUMNS)
+    with constraint_errors(foreign_key=(400, "Customer does not exist")):
+        department = (await db.execute(stmt)).one()._asdict()
+    await db.commit()
+    response_cache.invalidate("departments")
+    return json_response(department, status_code=201)
 
 
 @router.put("/{department_id}", response_model=schemas.DepartmentOut)
-def update_department(department_id: int, payload: schemas.DepartmentUpdate, db: Session = Depends(get_db)):
-    department = db.get(models.Department, department_id)
-    if not department:
+async def update_department(
+    department_id: int, payload: schemas.DepartmentUpdate, db: AsyncSession = Depends(get_async_write_db)
+):
+    data = payload.model_dump(exclude_unset=True)
+    if data:
+        stmt = (
+            update(models.Department)
+            .where(models.Department.id == department_id)
+            .values(**data)
+            .returning(*DEPARTMENT_COLUMNS)
+        )
+    else:
+        stmt = select(*DEPARTMENT_COLUMNS).where(models.Department.id == department_id)
+    row = (await db.execute(stmt)).one_or_none()
+    if row is None:
         raise HTTPException(status_code=404, detail="Department not found")
-    for key, value in payload.model_dump(exclude_unset=True).items():
-        setattr(department, key, value)
-    db.commit()
-    db.refresh(department)
-    return department
+    if data:
+        await db.commit()
+        response_cache.invalidate("departments")
+    return json_response(row._asdict())
 
 
 @router.delete("/{department_id}", status_code=204)
-def delete_department(department_id: int, db: Session = Depends(get_db)):
-    department = db.get(models.Department, department_id)
-    if not department:
+async def delete_department(department_id: int, db: AsyncSession = Depends(get_async_write_db)):
+    # Projects in the department lose their department_id (ON DELETE SET NULL).
+    stmt = delete(models.Department).where(models.Department.id == department_id).returning(models.Department.id)
+    if await db.scalar(stmt) is None:
         raise HTTPException(status_code=404, detail="Department not found")
-    db.delete(department)
-    db.commit()
+    await db.commit()
+    response_cache.invalidate("departments", "projects")
     return None
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import List
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_db, get_async_write_db
+from .. import models, periods, schemas
+
+router = APIRouter(prefix="/periods", tags=["periods"])
+
+
+async def _closed(db: AsyncSession, month=None) -> list[schemas.ClosedPeriodOut]:
+    snapshot = models.PeriodSnapshot
+    stmt = (
+        select(
+            models.ClosedPeriod.month,
+            models.ClosedPeriod.closed_at,
+            func.coalesce(func.sum(snapshot.hours), 0.0).label("hours"),
+            func.coalesce(func.sum(snapshot.entry_count), 0).label("entry_count"),
+        )
+        .outerjoin(snapshot, snapshot.month == models.ClosedPeriod.month)
+        .group_by(models.ClosedPeriod.month, models.ClosedPeriod.closed_at)
+        .order_by(models.ClosedPeriod.month.desc())
+    )
+    if month is not None:
+        stmt = stmt.where(models.ClosedPeriod.month == month)
+    return [
+        schemas.ClosedPeriodOut(
+            month=f"{r.month:%Y-%m}", closed_at=r.closed_at, hours=float(r.hours), entry_count=int(r.entry_count)
+        )
+        for r in (await db.execute(stmt)).all()
+    ]
+
+
+@router.get("/closed", response_model=List[schemas.ClosedPeriodOut])
+async def list_closed_periods(db: AsyncSession = Depends(get_async_db)):
+    return await _closed(db)
+
+
+@router.post("/closed", response_model=schemas.ClosedPeriodOut, status_code=201)
+async def close_period(payload: schemas.ClosedPeriodCreate, db: AsyncSession = Depends(get_async_write_db)):
+    """Lock a past month: its entries become read-only and reports use its snapshot."""
+    month = periods.parse_month(payload.month)
+    await db.run_sync(periods.close, month)
+    await db.commit()
+    return (await _closed(db, month))[0]
+
+
+@router.delete("/closed/{month}", status_code=204)
+async def reopen_period(month: str, db: AsyncSession = Depends(get_async_write_db)):
+    """Unlock a month; reports go back to aggregating it from the rollup."""
+    await db.run_sync(periods.reopen, periods.parse_month(month))
+    await db.commit()
+    return None
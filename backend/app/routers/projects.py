@@ -2,69 +2,142 @@ from __future__ import annotations
 
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from .. import models, schemas
+from ..cache import response_cache
+from ..database import get_async_db, get_async_write_db
+from ..errors import violation
+from ..pagination import keyset_page_async
+from ..serialization import dumps, json_response, row_dicts, schema_columns
+from .. import changes, models, schemas
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
+PROJECT_COLUMNS = schema_columns(models.Project, schemas.ProjectOut)
+
+
+def _filtered_projects(
+    customer_id: Optional[int],
+    department_id: Optional[int],
+    active: Optional[bool],
+):
+    stmt = select(*PROJECT_COLUMNS)
+    if customer_id is not None:
+        stmt = stmt.where(models.Project.customer_id == customer_id)
+    if department_id is not None:
+        stmt = stmt.where(models.Project.department_id == department_id)
+    if active is not None:
+        stmt = stmt.where(models.Project.active == active)
+    return stmt
+
 
 @router.get("/", response_model=List[schemas.ProjectOut])
-def list_projects(
+async def list_projects(
+    request: Request,
     customer_id: Optional[int] = None,
     department_id: Optional[int] = None,
     active: Optional[bool] = None,
     skip: int = 0,
     limit: int = Query(1000, le=10000),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = db.query(models.Project)
-    if customer_id is not None:
-        query = query.filter(models.Project.customer_id == customer_id)
-    if department_id is not None:
-        query = query.filter(models.Project.department_id == department_id)
-    if active is not None:
-        query = query.filter(models.Project.active == active)
-    return query.order_by(models.Project.name.asc()).offset(skip).limit(limit).all()
+    lookup = response_cache.lookup(request, "projects")
+    if (cached := lookup.cached()) is not None:
+        return cached
+    stmt = _filtered_projects(customer_id, department_id, active)
+    result = await db.execute(stmt.order_by(models.Project.name.asc()).offset(skip).limit(limit))
+    return lookup.store(dumps(row_dicts(result.all())))
+
+
+@router.get("/page", response_model=schemas.Page[schemas.ProjectOut])
+async def page_projects(
+    customer_id: Optional[int] = None,
+    department_id: Optional[int] = None,
+    active: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    stmt = _filtered_projects(customer_id, department_id, active)
+    page = await keyset_page_async(
+        db, stmt, (models.Project.name, models.Project.id), cursor, limit, include_total=include_total
+    )
+    return json_response({**page, "items": row_dicts(page["items"])})
+
+
+async def _missing_reference(db: AsyncSession, data: dict) -> HTTPException:
+    """The 400 for a foreign key violation; the database does not say which reference was missing."""
+    await db.rollback()
+    if "customer_id" in data and not await db.get(models.Customer, data["customer_id"]):
+        return HTTPException(status_code=400, detail="Customer does not exist")
+    return HTTPException(status_code=400, detail="Department does not exist")
+
+
+async def _write_project(db: AsyncSession, stmt, data: dict):
+    try:
+        return (await db.execute(stmt)).one_or_none()
+    except IntegrityError as exc:
+        if violation(exc) != "foreign_key":
+            raise
+        raise await _missing_reference(db, data) from None
 
 
 @router.post("/", response_model=schemas.ProjectOut, status_code=201)
-def create_project(payload: schemas.ProjectCreate, db: Session = Depends(get_db)):
-    if not db.get(models.Customer, payload.customer_id):
-        raise HTTPException(status_code=400, detail="Customer does not exist")
-    if payload.department_id is not None and not db.get(models.Department, payload.department_id):
-        raise HTTPException(status_code=400, detail="Department does not exist")
-    project = models.Project(**payload.model_dump())
-    db.add(project)
-    db.commit()
-    db.refresh(project)
-    return project
+async def create_project(payload: schemas.ProjectCreate, db: AsyncSession = Depends(get_async_write_db)):
+    data = payload.model_dump()
+    stmt = insert(models.Project).values(**data).returning(*PROJECT_COLUMNS)
+    project = (await _write_project(db, stmt, data))._asdict()
+    changes.record(db, "project", "create", project)
+    await db.commit()
+    response_cache.invalidate("projects")
+    return json_response(project, status_code=201)
 
 
 @router.put("/{project_id}", response_model=schemas.ProjectOut)
-def update_project(project_id: int, payload: schemas.ProjectUpdate, db: Session = Depends(get_db)):
-    project = db.get(models.Project, project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+async def update_project(
+    project_id: int, payload: schemas.ProjectUpdate, db: AsyncSession = Depends(get_async_write_db)
+):
     data = payload.model_dump(exclude_unset=True)
-    if "customer_id" in data and not db.get(models.Customer, data["customer_id"]):
-        raise HTTPException(status_code=400, detail="Customer does not exist")
-    if "department_id" in data and data["department_id"] is not None and not db.get(models.Department, data["department_id"]):
-        raise HTTPException(status_code=400, detail="Department does not exist")
-    for key, value in data.items():
-        setattr(project, key, value)
-    db.commit()
-    db.refresh(project)
-    return project
+    if data:
+        stmt = (
+            update(models.Project)
+            .where(models.Project.id == project_id)
+            .values(**data)
+            .returning(*PROJECT_COLUMNS)
+        )
+    else:
+        stmt = select(*PROJECT_COLUMNS).where(models.Project.id == project_id)
+    row = await _write_project(db, stmt, data)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    project = row._asdict()
+    if data:
+        changes.record(db, "project", "update", project)
+        await db.commit()
+        response_cache.invalidate("projects")
+    return json_response(project)
 
 
 @router.delete("/{project_id}", status_code=204)
-def delete_project(project_id: int, db: Session = Depends(get_db)):
-    project = db.get(models.Project, project_id)
-    if not project:
+async def delete_project(project_id: int, db: AsyncSession = Depends(get_async_write_db)):
+    # Its entries, rollups and period snapshots are removed by ON DELETE CASCADE, so a project
+    # with entries in a closed month (it has a snapshot there) is refused like any closed-period write.
+    closed = select(models.PeriodSnapshot.month).where(models.PeriodSnapshot.project_id == project_id)
+    stmt = (
+        delete(models.Project)
+        .where(models.Project.id == project_id, ~closed.exists())
+        .returning(models.Project.id)
+    )
+    if await db.scalar(stmt) is None:
+        month = await db.scalar(closed.order_by(models.PeriodSnapshot.month).limit(1))
+        if month is not None:
+            raise HTTPException(status_code=409, detail=f"Project has entries in closed period {month:%Y-%m}")
         raise HTTPException(status_code=404, detail="Project not found")
-    db.delete(project)
-    db.commit()
+    changes.record(db, "project", "delete", entity_id=project_id)
+    await db.commit()
+    response_cache.invalidate("projects")
     return None
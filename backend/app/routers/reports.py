@@ -1,42 +1,43 @@
 from __future__ import annotations
 
-from datetime import date
-from typing import List, Optional
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import Date, Integer, String, case, cast, func, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import get_async_db
+from .. import analytics, archive, models, periods, schemas
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+MAX_BUCKETS = 5000
+
 
 @router.get("/by-project", response_model=List[schemas.SummaryByProject])
-def report_by_project(
+async def report_by_project(
     from_date: Optional[date] = Query(default=None, alias="from"),
     to_date: Optional[date] = Query(default=None, alias="to"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = (
-        db.query(
+    source = await db.run_sync(periods.hours_source, from_date, to_date)
+    stmt = (
+        select(
             models.Project.id.label("project_id"),
             models.Project.name.label("project_name"),
             models.Customer.id.label("customer_id"),
             models.Customer.name.label("customer_name"),
-            func.sum(models.TimeEntry.hours).label("hours"),
+            func.sum(source.c.hours).label("hours"),
         )
-        .join(models.TimeEntry, models.TimeEntry.project_id == models.Project.id)
+        .join(source, source.c.project_id == models.Project.id)
         .join(models.Customer, models.Customer.id == models.Project.customer_id)
         .group_by(models.Project.id, models.Project.name, models.Customer.id, models.Customer.name)
-        .order_by(func.sum(models.TimeEntry.hours).desc())
+        .order_by(func.sum(source.c.hours).desc())
     )
-    if from_date is not None:
-        query = query.filter(models.TimeEntry.work_date >= from_date)
-    if to_date is not None:
-        query = query.filter(models.TimeEntry.work_date <= to_date)
-    rows = query.all()
+    rows = (await db.execute(stmt)).all()
     return [
         schemas.SummaryByProject(
             project_id=r.project_id,
@@ -50,27 +51,24 @@ def report_by_project(
 
 
 @router.get("/by-customer", response_model=List[schemas.SummaryByCustomer])
-def report_by_customer(
+async def report_by_customer(
     from_date: Optional[date] = Query(default=None, alias="from"),
     to_date: Optional[date] = Query(default=None, alias="to"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = (
-        db.query(
+    source = await db.run_sync(periods.hours_source, from_date, to_date)
+    stmt = (
+        select(
             models.Customer.id.label("customer_id"),
             models.Customer.name.label("customer_name"),
-            func.sum(models.TimeEntry.hours).label("hours"),
+            func.sum(source.c.hours).label("hours"),
         )
         .join(models.Project, models.Project.customer_id == models.Customer.id)
-        .join(models.TimeEntry, models.TimeEntry.project_id == models.Project.id)
+        .join(source, source.c.project_id == models.Project.id)
         .group_by(models.Customer.id, models.Customer.name)
-        .order_by(func.sum(models.TimeEntry.hours).desc())
+        .order_by(func.sum(source.c.hours).desc())
     )
-    if from_date is not None:
-        query = query.filter(models.TimeEntry.work_date >= from_date)
-    if to_date is not None:
-        query = query.filter(models.TimeEntry.work_date <= to_date)
-    rows = query.all()
+    rows = (await db.execute(stmt)).all()
     return [
         schemas.SummaryByCustomer(
             customer_id=r.customer_id,
@@ -79,3 +77,243 @@ def report_by_customer(
         )
         for r in rows
     ]
+
+
+async def _summary(
+    db: AsyncSession, from_date: Optional[date], to_date: Optional[date]
+) -> tuple[schemas.SummaryReport, float]:
+    """Project and customer totals plus the billable share, from a single aggregation pass."""
+    source = await db.run_sync(periods.hours_source, from_date, to_date)
+    project_cols = (models.Project.id, models.Project.name)
+    customer_cols = (models.Customer.id, models.Customer.name)
+    postgres = db.bind.dialect.name == "postgresql"
+    stmt = (
+        select(
+            models.Project.id.label("project_id"),
+            models.Project.name.label("project_name"),
+            models.Customer.id.label("customer_id"),
+            models.Customer.name.label("customer_name"),
+            func.sum(source.c.hours).label("hours"),
+            func.sum(case((source.c.billable, source.c.hours), else_=0.0)).label("billable"),
+        )
+        .join(source, source.c.project_id == models.Project.id)
+        .join(models.Customer, models.Customer.id == models.Project.customer_id)
+        .order_by(func.sum(source.c.hours).desc())
+    )
+    if postgres:
+        # Customer subtotals come back as extra rows with the project columns NULL.
+        stmt = stmt.group_by(func.grouping_sets(tuple_(*project_cols, *customer_cols), tuple_(*customer_cols)))
+    else:
+        stmt = stmt.group_by(*project_cols, *customer_cols)
+    rows = (await db.execute(stmt)).all()
+
+    project_rows = [r for r in rows if r.project_id is not None]
+    by_project = [
+        schemas.SummaryByProject(
+            project_id=r.project_id,
+            project_name=r.project_name,
+            customer_id=r.customer_id,
+            customer_name=r.customer_name,
+            hours=float(r.hours or 0.0),
+        )
+        for r in project_rows
+    ]
+    if postgres:
+        by_customer = [
+            schemas.SummaryByCustomer(customer_id=r.customer_id, customer_name=r.customer_name, hours=float(r.hours or 0.0))
+            for r in rows
+            if r.project_id is None
+        ]
+    else:
+        by_customer = _fold_customers(by_project)
+    billable = sum(float(r.billable or 0.0) for r in project_rows)
+    return schemas.SummaryReport(by_project=by_project, by_customer=by_customer), billable
+
+
+@router.get("/summary", response_model=schemas.SummaryReport)
+async def report_summary(
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Project and customer totals from a single aggregation pass."""
+    summary, _ = await _summary(db, from_date, to_date)
+    return summary
+
+
+@router.get("/dashboard", response_model=schemas.DashboardReport)
+async def report_dashboard(
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to"),
+    recent: int = Query(10, ge=0, le=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Everything the dashboard shows, from one session.
+
+    The totals come from the summary aggregation over the rollup; the recent
+    entries are a bounded seek on the (work_date, id) index.
+    """
+    summary, billable = await _summary(db, from_date, to_date)
+    recent_entries = []
+    if recent:
+        sources = await db.run_sync(archive.entry_sources, from_date, to_date)
+        stmt = archive.newest_first(sources, partial(_in_range, from_date=from_date, to_date=to_date), limit=recent)
+        recent_entries = (await db.execute(stmt)).all()
+    total = sum(p.hours for p in summary.by_project)
+    return schemas.DashboardReport(
+        by_project=summary.by_project,
+        by_customer=summary.by_customer,
+        recent_entries=recent_entries,
+        total_hours=total,
+        billable_hours=billable,
+        non_billable_hours=total - billable,
+    )
+
+
+def _in_range(stmt, entry, from_date: Optional[date], to_date: Optional[date]):
+    if from_date is not None:
+        stmt = stmt.where(entry.work_date >= from_date)
+    if to_date is not None:
+        stmt = stmt.where(entry.work_date <= to_date)
+    return stmt
+
+
+def _fold_customers(by_project: List[schemas.SummaryByProject]) -> List[schemas.SummaryByCustomer]:
+    totals: dict[int, schemas.SummaryByCustomer] = {}
+    for row in by_project:
+        total = totals.setdefault(
+            row.customer_id,
+            schemas.SummaryByCustomer(customer_id=row.customer_id, customer_name=row.customer_name, hours=0.0),
+        )
+        total.hours += row.hours
+    return sorted(totals.values(), key=lambda c: c.hours, reverse=True)
+
+
+def _bucket_expr(dialect: str, bucket: str, column):
+    """SQL expression for the first day of the day/ISO week/month containing ``column``."""
+    if dialect == "postgresql":
+        return cast(func.date_trunc(bucket, column), Date)
+    if bucket == "day":
+        return column
+    if bucket == "week":
+        # strftime('%w') is 0 for Sunday; step back to the ISO week's Monday.
+        days_since_monday = (cast(func.strftime("%w", column), Integer) + 6) % 7
+        return func.date(column, literal("-").concat(cast(days_since_monday, String)).concat(" days"))
+    return func.strftime("%Y-%m-01", column)
+
+
+def _bucket_start(bucket: str, day: date) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(bucket: str, start: date) -> date:
+    if bucket == "day":
+        return start + timedelta(days=1)
+    if bucket == "week":
+        return start + timedelta(days=7)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+@router.get("/timeseries", response_model=schemas.TimeseriesReport)
+async def report_timeseries(
+    bucket: Literal["day", "week", "month"] = "week",
+    group_by: Literal["project", "customer", "department"] = "project",
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Billable and non-billable hours per bucket and group, with empty buckets filled with zeros.
+
+    Weeks are ISO weeks starting on Monday; buckets are labelled with their first day.
+    """
+    rollup = models.TimeEntryRollup
+    bucket_col = _bucket_expr(db.bind.dialect.name, bucket, rollup.work_date).label("bucket")
+    stmt = select(bucket_col).select_from(rollup).join(models.Project, models.Project.id == rollup.project_id)
+    if group_by == "project":
+        key_id, key_name = models.Project.id, models.Project.name
+    elif group_by == "customer":
+        stmt = stmt.join(models.Customer, models.Customer.id == models.Project.customer_id)
+        key_id, key_name = models.Customer.id, models.Customer.name
+    else:
+        stmt = stmt.outerjoin(models.Department, models.Department.id == models.Project.department_id)
+        key_id, key_name = models.Department.id, models.Department.name
+    stmt = stmt.add_columns(
+        key_id.label("key_id"),
+        key_name.label("key_name"),
+        func.sum(case((rollup.billable, rollup.hours), else_=0.0)).label("billable"),
+        func.sum(case((rollup.billable, 0.0), else_=rollup.hours)).label("non_billable"),
+    ).group_by(bucket_col, key_id, key_name)
+    if from_date is not None:
+        stmt = stmt.where(rollup.work_date >= from_date)
+    if to_date is not None:
+        stmt = stmt.where(rollup.work_date <= to_date)
+    rows = (await db.execute(stmt)).all()
+
+    cells: dict[tuple, dict[date, tuple[float, float]]] = defaultdict(dict)
+    for r in rows:
+        cells[(r.key_id, r.key_name)][_as_date(r.bucket)] = (float(r.billable or 0.0), float(r.non_billable or 0.0))
+
+    seen = [day for series in cells.values() for day in series]
+    if not seen and (from_date is None or to_date is None):
+        return schemas.TimeseriesReport(bucket=bucket, group_by=group_by, series=[])
+    first = _bucket_start(bucket, from_date or min(seen))
+    last = _bucket_start(bucket, to_date or max(seen))
+    buckets = []
+    current = first
+    while current <= last:
+        buckets.append(current)
+        if len(buckets) > MAX_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"Range spans more than {MAX_BUCKETS} {bucket} buckets")
+        if current == last:
+            # Never step past the last bucket: the one after date.max's does not exist.
+            break
+        current = _next_bucket(bucket, current)
+
+    series = []
+    for (key, name), values in cells.items():
+        points = []
+        for start in buckets:
+            billable, non_billable = values.get(start, (0.0, 0.0))
+            points.append(
+                schemas.TimeseriesPoint(
+                    bucket=start,
+                    billable_hours=billable,
+                    non_billable_hours=non_billable,
+                    hours=billable + non_billable,
+                )
+            )
+        total = sum(p.hours for p in points)
+        label = name if name is not None else f"No {group_by}"
+        series.append(schemas.TimeseriesSeries(id=key, name=label, hours=total, points=points))
+    series.sort(key=lambda s: s.hours, reverse=True)
+    return schemas.TimeseriesReport(bucket=bucket, group_by=group_by, series=series)
+
+
+@router.get("/analytics", response_model=schemas.AnalyticsReport)
+async def report_analytics(
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to"),
+    window: int = Query(4, ge=1, le=52, description="weeks in the rolling averages"),
+    capacity: Optional[float] = Query(None, gt=0, description="available hours per week, for utilization"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Weekly hours, billable ratio and utilization with rolling averages, and per-department totals and
+    weekly distributions.
+
+    The range is widened to whole ISO weeks. Computed in memory from a cached columnar copy of the
+    rollup (see app/analytics.py), so ``data_version`` may lag writes by ``analytics_refresh_seconds``.
+    """
+    columns = await analytics.snapshots.get(db)
+    return analytics.report(columns, from_date, to_date, window, capacity)
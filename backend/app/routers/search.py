@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_db
+from .. import archive, schemas, search as search_index
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+Kind = Literal["time_entry", "customer", "project"]
+
+
+@router.get("/", response_model=schemas.Page[schemas.SearchHit])
+async def search(
+    q: str,
+    kind: Optional[List[Kind]] = Query(default=None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Entries (archived years included), customers and projects containing ``q``, best matches first."""
+    term = q.strip()
+    if len(term) < search_index.MIN_TERM_LENGTH:
+        raise HTTPException(
+            status_code=400, detail=f"Search term must be at least {search_index.MIN_TERM_LENGTH} characters"
+        )
+    kinds = list(dict.fromkeys(kind)) if kind else list(search_index.SOURCES)
+    entry_tables = await db.run_sync(archive.all_entries) if "time_entry" in kinds else ()
+    hits, total = await search_index.search(db, term, kinds, skip, limit, include_total, entry_tables)
+    return {"items": hits, "pagination": {"total": total, "skip": skip, "limit": limit}}
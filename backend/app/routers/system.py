@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..cache import response_cache
+from ..metrics import registry
+
+router = APIRouter(tags=["system"])
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    """Hit/miss/304 counters, entry count and table versions of the listing cache."""
+    return response_cache.snapshot()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Request latency, per-request statement counts and SQL timings in the Prometheus text format."""
+    cache = response_cache.snapshot()
+    extra = [
+        "# HELP timemanager_cache_requests_total Listing cache lookups by outcome.",
+        "# TYPE timemanager_cache_requests_total counter",
+        *(f'timemanager_cache_requests_total{{outcome="{k}"}} {cache[k]}' for k in ("hits", "misses", "not_modified")),
+        "# HELP timemanager_cache_entries Bodies currently held by the listing cache.",
+        "# TYPE timemanager_cache_entries gauge",
+        f"timemanager_cache_entries {cache['entries']}",
+    ]
+    return PlainTextResponse(registry.render(extra), media_type="text/plain; version=0.0.4")
@@ -1,77 +1,369 @@
 from __future__ import annotations
 
+import csv
+import io
+import json
 from datetime import date
-from typing import List, Optional
+from typing import AsyncIterator, List, Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import AsyncSessionLocal, get_async_db, get_async_write_db
+from ..errors import constraint_errors
+from ..pagination import keyset_page_async
+from ..serialization import json_response, ndjson_lines, row_dicts, schema_columns
+from .. import archive, changes, groupcommit, models, periods, rollup, schemas
 
 router = APIRouter(prefix="/time-entries", tags=["time_entries"])
 
+BULK_CHUNK_SIZE = 5000
+EXPORT_BATCH_SIZE = 2000
+EXPORT_COLUMNS = ("id", "project_id", "work_date", "hours", "description", "billable", "created_at", "updated_at")
+# Listings select these columns rather than entities; see app.serialization.
+ENTRY_COLUMNS = schema_columns(models.TimeEntry, schemas.TimeEntryOut)
+# What ``expand`` can side-load: the model and the columns selected for it.
+EXPANSIONS = {
+    "project": (models.Project, schema_columns(models.Project, schemas.ProjectOut)),
+    "customer": (models.Customer, schema_columns(models.Customer, schemas.CustomerOut)),
+    "department": (models.Department, schema_columns(models.Department, schemas.DepartmentOut)),
+}
+EXPAND_QUERY = Query(
+    None,
+    description="comma-separated project, customer, department: return {items, included} with each referenced row once",
+)
 
-@router.get("/", response_model=List[schemas.TimeEntryOut])
-def list_time_entries(
+
+def _filter_entries(
+    stmt,
+    project_id: Optional[int],
+    customer_id: Optional[int],
+    from_date: Optional[date],
+    to_date: Optional[date],
+    entry=models.TimeEntry,
+):
+    """Apply the shared listing filters to a ``Select`` over ``entry`` (``TimeEntry`` or an archive alias)."""
+    if project_id is not None:
+        stmt = stmt.where(entry.project_id == project_id)
+    if customer_id is not None:
+        stmt = stmt.join(models.Project, models.Project.id == entry.project_id).where(
+            models.Project.customer_id == customer_id
+        )
+    if from_date is not None:
+        stmt = stmt.where(entry.work_date >= from_date)
+    if to_date is not None:
+        stmt = stmt.where(entry.work_date <= to_date)
+    return stmt
+
+
+def _filters(project_id, customer_id, from_date, to_date):
+    return lambda stmt, entry: _filter_entries(stmt, project_id, customer_id, from_date, to_date, entry)
+
+
+def _parse_expand(expand: Optional[str]) -> set[str]:
+    requested = {part.strip() for part in (expand or "").split(",") if part.strip()}
+    unknown = requested - EXPANSIONS.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot expand {', '.join(sorted(unknown))}; choose from {', '.join(EXPANSIONS)}",
+        )
+    return requested
+
+
+async def _rows_by_id(db: AsyncSession, kind: str, ids: set[int]) -> list[dict]:
+    if not ids:
+        return []
+    model, columns = EXPANSIONS[kind]
+    result = await db.execute(select(*columns).where(model.id.in_(sorted(ids))).order_by(model.id))
+    return row_dicts(result.all())
+
+
+async def _included(db: AsyncSession, items: list[dict], expand: set[str]) -> dict[str, list[dict]]:
+    """The projects, customers and departments ``items`` refer to.
+
+    One ``IN`` query per kind over the distinct ids, like ``selectinload``, so a
+    page costs the same number of statements whatever its size.
+    """
+    projects = await _rows_by_id(db, "project", {item["project_id"] for item in items})
+    included = {}
+    if "project" in expand:
+        included["projects"] = projects
+    if "customer" in expand:
+        included["customers"] = await _rows_by_id(db, "customer", {p["customer_id"] for p in projects})
+    if "department" in expand:
+        department_ids = {p["department_id"] for p in projects if p["department_id"] is not None}
+        included["departments"] = await _rows_by_id(db, "department", department_ids)
+    return included
+
+
+@router.get("/", response_model=Union[List[schemas.TimeEntryOut], schemas.Expanded[schemas.TimeEntryOut]])
+async def list_time_entries(
     project_id: Optional[int] = None,
     customer_id: Optional[int] = None,
     from_date: Optional[date] = Query(default=None, alias="from"),
     to_date: Optional[date] = Query(default=None, alias="to"),
     skip: int = 0,
     limit: int = Query(1000, le=10000),
-    db: Session = Depends(get_db),
+    expand: Optional[str] = EXPAND_QUERY,
+    db: AsyncSession = Depends(get_async_db),
 ):
-    query = db.query(models.TimeEntry)
-    if project_id is not None:
-        query = query.filter(models.TimeEntry.project_id == project_id)
-    if customer_id is not None:
-        query = query.join(models.TimeEntry.project).filter(models.Project.customer_id == customer_id)
-    if from_date is not None:
-        query = query.filter(models.TimeEntry.work_date >= from_date)
-    if to_date is not None:
-        query = query.filter(models.TimeEntry.work_date <= to_date)
-    return (
-        query.order_by(models.TimeEntry.work_date.desc(), models.TimeEntry.id.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    """Entries newest first; with ``expand`` the list moves to ``items`` next to the ``included`` rows."""
+    expanded = _parse_expand(expand)
+    sources = await db.run_sync(archive.entry_sources, from_date, to_date)
+    where = _filters(project_id, customer_id, from_date, to_date)
+    stmt = archive.newest_first(sources, where, limit=skip + limit)
+    result = await db.execute(stmt.offset(skip).limit(limit))
+    items = row_dicts(result.all())
+    if not expanded:
+        return json_response(items)
+    return json_response({"items": items, "included": await _included(db, items, expanded)})
+
+
+@router.get(
+    "/page",
+    response_model=Union[schemas.Page[schemas.TimeEntryOut], schemas.ExpandedPage[schemas.TimeEntryOut]],
+)
+async def page_time_entries(
+    project_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to"),
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    include_total: bool = False,
+    expand: Optional[str] = EXPAND_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Cursor-paginated listing; pass ``pagination.next_cursor`` back as ``cursor`` for the next page."""
+    expanded = _parse_expand(expand)
+    sources = await db.run_sync(archive.entry_sources, from_date, to_date)
+    stmt = archive.newest_first(sources, _filters(project_id, customer_id, from_date, to_date)).order_by(None)
+    page = await keyset_page_async(
+        db,
+        stmt,
+        (stmt.selected_columns.work_date, stmt.selected_columns.id),
+        cursor,
+        limit,
+        descending=True,
+        include_total=include_total,
     )
+    items = row_dicts(page["items"])
+    if not expanded:
+        return json_response({**page, "items": items})
+    return json_response({**page, "items": items, "included": await _included(db, items, expanded)})
 
 
-@router.post("/", response_model=schemas.TimeEntryOut, status_code=201)
-def create_time_entry(payload: schemas.TimeEntryCreate, db: Session = Depends(get_db)):
-    project = db.get(models.Project, payload.project_id)
-    if not project:
-        raise HTTPException(status_code=400, detail="Project does not exist")
-    entry = models.TimeEntry(**payload.model_dump())
-    db.add(entry)
-    db.commit()
-    db.refresh(entry)
+async def _export_rows(where, from_date: Optional[date], to_date: Optional[date], fmt: str) -> AsyncIterator[str | bytes]:
+    # The request-scoped session is closed before a streaming body is sent, so the
+    # export owns its session for as long as the client keeps reading.
+    async with AsyncSessionLocal() as db:
+        sources = await db.run_sync(archive.entry_sources, from_date, to_date)
+        stmt = archive.newest_first(sources, where, columns=EXPORT_COLUMNS)
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\r\n"
+        async for rows in result.partitions():
+            if fmt == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                yield buffer.getvalue()
+            else:
+                yield ndjson_lines(rows)
+
+
+@router.get("/export")
+async def export_time_entries(
+    project_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    from_date: Optional[date] = Query(default=None, alias="from"),
+    to_date: Optional[date] = Query(default=None, alias="to"),
+    fmt: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+):
+    """Stream every matching entry as NDJSON or CSV without loading the result into memory."""
+    rows = _export_rows(_filters(project_id, customer_id, from_date, to_date), from_date, to_date, fmt)
+    if fmt == "csv":
+        return StreamingResponse(
+            rows,
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="time-entries.csv"'},
+        )
+    return StreamingResponse(rows, media_type="application/x-ndjson")
+
+
+async def _create_entry(db: AsyncSession, payload: schemas.TimeEntryCreate) -> schemas.TimeEntryOut:
+    await db.run_sync(periods.ensure_open, [payload.work_date])
+    stmt = insert(models.TimeEntry).values(**payload.model_dump()).returning(*ENTRY_COLUMNS)
+    with constraint_errors(foreign_key=(400, "Project does not exist")):
+        row = (await db.execute(stmt)).one()
+    # Through the schema: SQLite's RETURNING hands back whole-number REALs as ints.
+    entry = schemas.TimeEntryOut.model_validate(row._asdict())
+    await db.run_sync(rollup.add_entry, entry)
+    changes.record(db, "time_entry", "create", entry)
     return entry
 
 
-@router.put("/{entry_id}", response_model=schemas.TimeEntryOut)
-def update_time_entry(entry_id: int, payload: schemas.TimeEntryUpdate, db: Session = Depends(get_db)):
-    entry = db.get(models.TimeEntry, entry_id)
+@router.post("/", response_model=schemas.TimeEntryOut, status_code=201)
+async def create_time_entry(payload: schemas.TimeEntryCreate):
+    # Single-entry writes go through app.groupcommit, which batches concurrent ones when enabled.
+    entry = await groupcommit.run(lambda db: _create_entry(db, payload))
+    return json_response(entry, status_code=201)
+
+
+async def _bulk_records(request: Request) -> AsyncIterator[dict | object]:
+    """Yield raw records from a JSON array, NDJSON or CSV request body."""
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        async for line in _lines(request):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                yield exc
+    elif content_type == "text/csv":
+        header: list[str] | None = None
+        pending = ""
+        async for line in _lines(request):
+            pending += line
+            if pending.count('"') % 2:
+                # Quoted field continues on the next line.
+                pending += "\n"
+                continue
+            line, pending = pending, ""
+            if not line.strip():
+                continue
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            # Empty cells fall back to the schema defaults.
+            yield {key: value for key, value in zip(header, values) if value != ""}
+    elif content_type == "application/json":
+        try:
+            records = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body is not valid JSON")
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of time entries")
+        for record in records:
+            yield record
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+
+
+async def _lines(request: Request) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8-sig")
+    if buffer:
+        yield buffer.rstrip(b"\r").decode("utf-8-sig")
+
+
+async def _insert_chunk(db: AsyncSession, rows: list[dict]) -> None:
+    await db.execute(insert(models.TimeEntry), rows)
+    await db.run_sync(rollup.add_many, rows)
+
+
+@router.post("/bulk", response_model=schemas.BulkImportResult)
+async def bulk_create_time_entries(request: Request, db: AsyncSession = Depends(get_async_write_db)):
+    """Import many entries from a JSON array, NDJSON (``application/x-ndjson``) or CSV (``text/csv``).
+
+    Valid rows are inserted in chunks and committed once; invalid rows are reported by
+    their 1-based position in the input and skipped.
+    """
+    project_ids = set((await db.scalars(select(models.Project.id))).all())
+    # Like ensure_open: no month can be closed under the import.
+    await db.run_sync(periods.lock)
+    closed_months = set((await db.scalars(select(models.ClosedPeriod.month))).all())
+    received = 0
+    inserted = 0
+    errors: list[schemas.BulkRowError] = []
+    chunk: list[dict] = []
+    async for record in _bulk_records(request):
+        received += 1
+        if isinstance(record, Exception):
+            errors.append(schemas.BulkRowError(row=received, detail=f"Invalid JSON: {record}"))
+            continue
+        try:
+            payload = schemas.TimeEntryCreate.model_validate(record)
+        except ValidationError as exc:
+            detail = "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in exc.errors())
+            errors.append(schemas.BulkRowError(row=received, detail=detail))
+            continue
+        if payload.project_id not in project_ids:
+            errors.append(schemas.BulkRowError(row=received, detail="Project does not exist"))
+            continue
+        if periods.month_start(payload.work_date) in closed_months:
+            errors.append(schemas.BulkRowError(row=received, detail=f"Period {payload.work_date:%Y-%m} is closed"))
+            continue
+        chunk.append(payload.model_dump())
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            await _insert_chunk(db, chunk)
+            inserted += len(chunk)
+            chunk = []
+    if chunk:
+        await _insert_chunk(db, chunk)
+        inserted += len(chunk)
+    if inserted:
+        # Bulk rows are logged as one change; clients reload instead of applying them one by one.
+        changes.record(db, "time_entry", "bulk", data={"inserted": inserted})
+    await db.commit()
+    return schemas.BulkImportResult(received=received, inserted=inserted, errors=errors)
+
+
+async def _ensure_not_archived(db: AsyncSession, entry_id: int) -> None:
+    """Raise the closed-period 409 for an entry that was moved to an archive table."""
+    work_date = await db.run_sync(archive.archived_work_date, entry_id)
+    if work_date is not None:
+        await db.run_sync(periods.ensure_open, [work_date])
+
+
+async def _update_entry(db: AsyncSession, entry_id: int, payload: schemas.TimeEntryUpdate) -> schemas.TimeEntryOut:
+    entry = await db.get(models.TimeEntry, entry_id)
     if not entry:
+        await _ensure_not_archived(db, entry_id)
         raise HTTPException(status_code=404, detail="Time entry not found")
     data = payload.model_dump(exclude_unset=True)
-    if "project_id" in data:
-        if not db.get(models.Project, data["project_id"]):
-            raise HTTPException(status_code=400, detail="Project does not exist")
+    # Both the month the entry is in and the one it would move to must be open.
+    await db.run_sync(periods.ensure_open, [entry.work_date, data.get("work_date") or entry.work_date])
+    before = rollup.EntryValues.of(entry)
     for key, value in data.items():
         setattr(entry, key, value)
-    db.commit()
-    db.refresh(entry)
-    return entry
+    with constraint_errors(foreign_key=(400, "Project does not exist")):
+        await db.flush()
+    await db.run_sync(rollup.move_entry, before, entry)
+    changes.record(db, "time_entry", "update", entry)
+    # Validated now: a later write in the same group commit may roll back and expire ``entry``.
+    return schemas.TimeEntryOut.model_validate(entry)
+
+
+@router.put("/{entry_id}", response_model=schemas.TimeEntryOut)
+async def update_time_entry(entry_id: int, payload: schemas.TimeEntryUpdate):
+    entry = await groupcommit.run(lambda db: _update_entry(db, entry_id, payload))
+    return json_response(entry)
 
 
 @router.delete("/{entry_id}", status_code=204)
-def delete_time_entry(entry_id: int, db: Session = Depends(get_db)):
-    entry = db.get(models.TimeEntry, entry_id)
-    if not entry:
+async def delete_time_entry(entry_id: int, db: AsyncSession = Depends(get_async_write_db)):
+    stmt = (
+        delete(models.TimeEntry)
+        .where(models.TimeEntry.id == entry_id)
+        .returning(models.TimeEntry.project_id, models.TimeEntry.work_date, models.TimeEntry.hours, models.TimeEntry.billable)
+    )
+    entry = (await db.execute(stmt)).one_or_none()
+    if entry is None:
+        await _ensure_not_archived(db, entry_id)
         raise HTTPException(status_code=404, detail="Time entry not found")
-    db.delete(entry)
-    db.commit()
+    # Raising here rolls the DELETE back with the rest of the transaction.
+    await db.run_sync(periods.ensure_open, [entry.work_date])
+    await db.run_sync(rollup.remove_entry, entry)
+    changes.record(db, "time_entry", "delete", entity_id=entry_id)
+    await db.commit()
     return None
@@ -1,16 +1,24 @@
 from __future__ import annotations
 
 from datetime import date, datetime
-from typing import Optional
+from typing import Generic, Literal, Optional, TypeVar
 
 from pydantic import BaseModel, Field
 
+T = TypeVar("T")
+
 
 # Shared
 class Pagination(BaseModel):
-    total: int
-    skip: int
+    total: Optional[int] = None
+    skip: int = 0
     limit: int
+    next_cursor: Optional[str] = None
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    pagination: Pagination
 
 
 # Customer
@@ -117,6 +125,23 @@ class TimeEntryOut(TimeEntryBase):
         from_attributes = True
 
 
+class Included(BaseModel):
+    """Rows referenced by a listing's items, each listed once; only the expanded kinds are present."""
+
+    projects: Optional[list[ProjectOut]] = None
+    customers: Optional[list[CustomerOut]] = None
+    departments: Optional[list[DepartmentOut]] = None
+
+
+class Expanded(BaseModel, Generic[T]):
+    items: list[T]
+    included: Included
+
+
+class ExpandedPage(Page[T], Generic[T]):
+    included: Included
+
+
 # Reports
 class SummaryByProject(BaseModel):
     project_id: int
@@ -130,3 +155,122 @@ class SummaryByCustomer(BaseModel):
     customer_id: int
     customer_name: str
     hours: float
+
+
+class SummaryReport(BaseModel):
+    by_project: list[SummaryByProject]
+    by_customer: list[SummaryByCustomer]
+
+
+class DashboardReport(SummaryReport):
+    recent_entries: list[TimeEntryOut]
+    total_hours: float
+    billable_hours: float
+    non_billable_hours: float
+
+
+class TimeseriesPoint(BaseModel):
+    bucket: date
+    billable_hours: float
+    non_billable_hours: float
+    hours: float
+
+
+class TimeseriesSeries(BaseModel):
+    id: Optional[int]
+    name: str
+    hours: float
+    points: list[TimeseriesPoint]
+
+
+class TimeseriesReport(BaseModel):
+    bucket: str
+    group_by: str
+    series: list[TimeseriesSeries]
+
+
+class AnalyticsWeek(BaseModel):
+    week: date
+    hours: float
+    billable_hours: float
+    billable_ratio: Optional[float]
+    # Hours / capacity; null without a capacity.
+    utilization: Optional[float]
+    billable_utilization: Optional[float]
+    # Over this week and the window - 1 weeks before it (fewer at the start of the range).
+    rolling_hours: float
+    rolling_billable_ratio: Optional[float]
+
+
+class AnalyticsDepartment(BaseModel):
+    id: Optional[int]
+    name: str
+    hours: float
+    billable_hours: float
+    billable_ratio: Optional[float]
+    share: Optional[float]
+    # Distribution of the department's hours over the weeks of the range.
+    weekly_mean: float
+    weekly_p50: float
+    weekly_p90: float
+    weekly_max: float
+
+
+class AnalyticsReport(BaseModel):
+    data_version: str
+    start: Optional[date] = None
+    end: Optional[date] = None
+    window: int
+    capacity: Optional[float]
+    hours: float = 0.0
+    billable_hours: float = 0.0
+    billable_ratio: Optional[float] = None
+    utilization: Optional[float] = None
+    billable_utilization: Optional[float] = None
+    weeks: list[AnalyticsWeek]
+    departments: list[AnalyticsDepartment]
+
+
+# Search
+class SearchHit(BaseModel):
+    kind: Literal["time_entry", "customer", "project"]
+    id: int
+    # Customer/project name, or a snippet of the entry description with the match in [brackets].
+    text: Optional[str]
+    score: float
+    project_id: Optional[int] = None
+    work_date: Optional[date] = None
+
+
+# Closed periods
+class ClosedPeriodCreate(BaseModel):
+    month: str = Field(..., pattern=r"^\d{4}-\d{2}$", description="YYYY-MM")
+
+
+class ClosedPeriodOut(BaseModel):
+    month: str
+    closed_at: datetime
+    hours: float
+    entry_count: int
+
+
+# Change feed
+class ChangeOut(BaseModel):
+    seq: int
+    entity: Literal["time_entry", "project", "customer"]
+    op: Literal["create", "update", "delete", "bulk"]
+    entity_id: Optional[int]
+    data: Optional[dict]
+    created_at: datetime
+
+
+# Bulk import
+class BulkRowError(BaseModel):
+    row: int
+    detail: str
+
+
+class BulkImportResult(BaseModel):
+    received: int
+    inserted: int
+    errors: list[BulkRowError]
@@ -0,0 +1,195 @@
+"""Substring search over time entry descriptions and customer/project names.
+
+On SQLite each searchable table has an external-content FTS5 table using the
+``trigram`` tokenizer (``time_entries_fts``, ``customers_fts``, ``projects_fts``),
+kept in sync by triggers, so every write path (the routers, bulk import, the
+benchmark seeders) is covered without application code. On PostgreSQL the same
+columns get ``pg_trgm`` GIN indexes, which serve ``ILIKE '%term%'`` directly
+(where the extension is not installed the migration skips them and searches
+fall back to sequential scans).
+
+Both backends match the term as a case-insensitive substring, like the ILIKE
+they replace. Trigram indexes need at least three characters to narrow the
+search; shorter terms are rejected by ``/search`` and fall back to a plain
+ILIKE in the customer listing.
+
+Archive tables (``app.archive``) get the same index when a year is archived,
+and ``/search`` covers them along with ``time_entries``.
+"""
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+from sqlalchemy import Date, Float, Integer, String, Table, cast, func, literal, null, select, text, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+MIN_TERM_LENGTH = 3
+# Per kind; a very common term is ranked among its newest matches only.
+RANK_CANDIDATES = 2_000
+
+# kind -> (table, id column, searched column)
+SOURCES = {
+    "time_entry": ("time_entries", "id", "description"),
+    "customer": ("customers", "id", "name"),
+    "project": ("projects", "id", "name"),
+}
+
+
+def _sqlite_ddl(table: str, column: str) -> list[str]:
+    fts = f"{table}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        # Index the rows that existed before the table was created.
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _has_trgm(conn: Connection) -> bool:
+    return conn.scalar(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")) is not None
+
+
+def _index(conn: Connection, table: str, column: str) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.execute(
+            text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)")
+        )
+        return
+    for statement in _sqlite_ddl(table, column):
+        conn.execute(text(statement))
+
+
+def create_index(conn: Connection) -> None:
+    """Create the search tables/indexes for the connection's dialect (used by the migrations)."""
+    if conn.dialect.name == "postgresql":
+        try:
+            with conn.begin_nested():
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except DBAPIError:
+            return
+    for table, _, column in SOURCES.values():
+        _index(conn, table, column)
+
+
+def index_archive(conn: Connection, table: str) -> None:
+    """Index the descriptions of archive table ``table`` like those of ``time_entries``."""
+    if conn.dialect.name == "postgresql" and not _has_trgm(conn):
+        return
+    _index(conn, table, SOURCES["time_entry"][2])
+
+
+def drop_archive_index(conn: Connection, table: str) -> None:
+    """Drop what ``index_archive`` created that does not go away with the table itself."""
+    if conn.dialect.name == "sqlite":
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}_fts"))
+
+
+def fts_phrase(term: str) -> str:
+    """Quote ``term`` as a single FTS5 phrase, i.e. a literal substring for the trigram tokenizer."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def customer_name_filter(dialect: str, term: str):
+    """WHERE clause matching customers whose name contains ``term``."""
+    if dialect == "sqlite" and len(term) >= MIN_TERM_LENGTH:
+        matches = text("SELECT rowid FROM customers_fts WHERE customers_fts MATCH :customer_term").bindparams(
+            customer_term=fts_phrase(term)
+        )
+        return models.Customer.id.in_(matches.columns(rowid=Integer))
+    return models.Customer.name.ilike(like_pattern(term), escape="\\")
+
+
+def _sqlite_part(kind: str, table: str) -> str:
+    _, id_column, column = SOURCES[kind]
+    fts = f"{table}_fts"
+    if kind == "time_entry":
+        shown = f"snippet({fts}, 0, '[', ']', '...', 12)"
+        extra = "t.project_id, t.work_date"
+    else:
+        shown, extra = column, "NULL, NULL"
+    # bm25 is computed per candidate, so only the newest RANK_CANDIDATES matches are
+    # ranked; the best :window of those are joined back to the base table.
+    matches = (
+        f"SELECT rowid, rank, {shown} AS text FROM {fts} WHERE {fts} MATCH :term "
+        f"ORDER BY rowid DESC LIMIT :candidates"
+    )
+    return (
+        f"SELECT '{kind}' AS kind, t.{id_column} AS id, m.text AS text, -m.rank AS score, {extra} "
+        f"FROM (SELECT * FROM ({matches}) ORDER BY rank LIMIT :window) m "
+        f"JOIN {table} t ON t.{id_column} = m.rowid"
+    )
+
+
+def _postgres_part(kind: str, term: str, table: Table):
+    column = table.c[SOURCES[kind][2]]
+    if kind == "time_entry":
+        extra = (table.c.project_id, table.c.work_date)
+    else:
+        extra = (cast(null(), Integer), cast(null(), Date))
+    return select(
+        literal(kind, String).label("kind"),
+        table.c.id.label("id"),
+        column.label("text"),
+        # Share of the field covered by the match, so short exact-ish names outrank long descriptions.
+        (literal(float(len(term)), Float) / func.greatest(func.length(column), 1)).label("score"),
+        extra[0].label("project_id"),
+        extra[1].label("work_date"),
+    ).where(column.ilike(like_pattern(term), escape="\\"))
+
+
+def _tables(kind: str, entry_tables: Sequence[Table]) -> Sequence[Table]:
+    if kind == "time_entry":
+        return entry_tables
+    return ({"customer": models.Customer, "project": models.Project}[kind].__table__,)
+
+
+async def search(
+    db: AsyncSession,
+    term: str,
+    kinds: list[str],
+    skip: int,
+    limit: int,
+    include_total: bool = False,
+    entry_tables: Sequence[Table] = (models.TimeEntry.__table__,),
+) -> tuple[list[dict], Optional[int]]:
+    """Ranked hits for ``term`` across ``kinds``, best first, and optionally the number of matches.
+
+    Time entries are searched in ``entry_tables``: ``time_entries`` and, from the router,
+    the archive tables (see ``archive.all_entries``).
+    """
+    parts = [(kind, table) for kind in kinds for table in _tables(kind, entry_tables)]
+    if db.bind.dialect.name == "postgresql":
+        union = union_all(*(_postgres_part(kind, term, table) for kind, table in parts)).subquery()
+        stmt = select(union).order_by(union.c.score.desc(), union.c.kind, union.c.id).offset(skip).limit(limit)
+        rows = (await db.execute(stmt)).mappings().all()
+        total = (await db.scalar(select(func.count()).select_from(union))) if include_total else None
+        return [dict(r) for r in rows], total
+
+    params = {"term": fts_phrase(term)}
+    union = " UNION ALL ".join(_sqlite_part(kind, table.name) for kind, table in parts)
+    stmt = text(f"SELECT * FROM ({union}) ORDER BY score DESC, kind, id LIMIT :limit OFFSET :skip")
+    window = {"candidates": max(RANK_CANDIDATES, skip + limit), "window": skip + limit, "limit": limit, "skip": skip}
+    rows = (await db.execute(stmt, {**params, **window})).mappings().all()
+    total = None
+    if include_total:
+        counts = " + ".join(
+            f"(SELECT count(*) FROM {table.name}_fts WHERE {table.name}_fts MATCH :term)" for _, table in parts
+        )
+        total = await db.scalar(text(f"SELECT {counts}"), params)
+    return [dict(r) for r in rows], total
@@ -0,0 +1,52 @@
+"""Serve the API from several worker processes.
+
+Applies pending migrations once, then starts uvicorn with ``--workers``. The
+workers skip their own startup migration and share a freshly cleared
+``shared_state_dir`` (a temporary directory unless one is configured), which
+keeps their listing caches consistent and lets ``/metrics`` report all of them.
+
+    python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import uvicorn
+
+from . import migrations, shared
+from .config import settings
+
+
+def main(argv: list[str] | None = None) -> int:
+    from .database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.serve", description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    for name in migrations.upgrade(engine):
+        print(f"applied {name}")
+    engine.dispose()
+
+    state_dir = settings.shared_state_dir or tempfile.mkdtemp(prefix="timemanager-")
+    shared.reset(state_dir)
+    # The workers are spawned, not forked, so they read their settings from the environment.
+    os.environ["TIMEMANAGER_SHARED_STATE_DIR"] = state_dir
+    os.environ["TIMEMANAGER_AUTO_MIGRATE"] = "false"
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+    finally:
+        if not settings.shared_state_dir:
+            shutil.rmtree(state_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
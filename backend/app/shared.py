@@ -0,0 +1,111 @@
+"""State shared by the worker processes of one server (``python -m app.serve``).
+
+With ``shared_state_dir`` set, all workers of a server use the same directory.
+The listing cache keeps its table versions in a memory-mapped file there, so a
+write handled by one worker invalidates the cached listings of every worker.
+Each worker also publishes its metrics and cache counters to
+``<name>-<pid>.json`` every ``metrics_flush_seconds``, and ``/metrics`` and
+``/cache/stats`` report the sum over all workers. Responses stored for
+``Idempotency-Key`` replays go to its ``idempotency`` subdirectory. Without the
+directory everything stays in-process.
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import orjson
+
+from .config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_publishers: dict[str, Callable[[], Any]] = {}
+_published: dict[str, bytes] = {}
+_flush_lock = threading.Lock()
+_stop: Optional[threading.Event] = None
+
+
+def state_dir() -> Optional[Path]:
+    return Path(settings.shared_state_dir) if settings.shared_state_dir else None
+
+
+def reset(directory: str | Path) -> None:
+    """Create ``directory`` or clear the state a previous server left in it."""
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    for name in ("*.json", "*.json.tmp", "cache-versions", "idempotency/*"):
+        for stale in path.glob(name):
+            stale.unlink(missing_ok=True)
+
+
+def lock(fd: int, exclusive: bool = True) -> None:
+    if fcntl is None:
+        raise RuntimeError("shared_state_dir needs fcntl file locks, which this platform does not have")
+    fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def unlock(fd: int) -> None:
+    fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def publish(name: str, producer: Callable[[], Any]) -> None:
+    """Write ``producer()`` to this worker's ``<name>-<pid>.json`` whenever it changes."""
+    _publishers[name] = producer
+
+
+def collect(name: str) -> list[Any]:
+    """The last state every *other* worker published under ``name``."""
+    directory = state_dir()
+    if directory is None:
+        return []
+    own = f"{name}-{os.getpid()}.json"
+    states = []
+    for path in directory.glob(f"{name}-*.json"):
+        if path.name == own:
+            continue
+        try:
+            states.append(orjson.loads(path.read_bytes()))
+        except (OSError, orjson.JSONDecodeError):
+            continue  # the worker's file was replaced or removed while reading
+    return states
+
+
+def flush() -> None:
+    directory = state_dir()
+    if directory is None:
+        return
+    with _flush_lock:
+        pid = os.getpid()
+        for name, producer in _publishers.items():
+            body = orjson.dumps(producer())
+            if _published.get(name) == body:
+                continue
+            path = directory / f"{name}-{pid}.json"
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(body)
+            # Readers see either the previous state or this one, never a partial file.
+            os.replace(tmp, path)
+            _published[name] = body
+
+
+def start() -> None:
+    """Start publishing this worker's state (no-op without ``shared_state_dir``)."""
+    global _stop
+    if state_dir() is None or _stop is not None:
+        return
+    _stop = threading.Event()
+    stop = _stop
+
+    def run() -> None:
+        while not stop.wait(settings.metrics_flush_seconds):
+            flush()
+
+    threading.Thread(target=run, name="shared-state", daemon=True).start()
+    atexit.register(flush)
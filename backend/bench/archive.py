@@ -0,0 +1,159 @@
+"""Read-equivalence check for archived years.
+
+Seeds a throwaway SQLite database with ``bench.datagen``, copies it, archives
+``--year`` in the copy (``app.archive.archive_year``), then serves both files
+and requests the same listings, keyset pages, reports and searches from each.
+Searches compare the total and the set of matches, not their order: bm25
+scores use per-table statistics, so they shift when entries move to another
+index. Exits non-zero if any response differs, if the rollup tables differ,
+or if the archived copy's rollup no longer matches its entries
+(``app.rollup.verify``).
+
+    python -m bench.archive
+    python -m bench.archive --entries 100000 --year 2023
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app import archive, models, rollup
+from bench import loadgen
+from bench.datagen import seed
+from bench.server import serve
+
+START = date(2022, 1, 1)
+DAYS = 3 * 365
+
+# Responses that must not change when a year is archived. Ranges cross the
+# archived year's edges, lie inside it, or avoid it.
+PATHS = [
+    "/time-entries/?limit=200",
+    "/time-entries/?limit=100&skip=5000",
+    "/time-entries/?from={year}-11-15&to={next}-02-15&limit=1000",
+    "/time-entries/?from={year}-03-01&to={year}-05-31&limit=1000",
+    "/time-entries/?from={next}-01-01&limit=500",
+    "/time-entries/?project_id=1&limit=500",
+    "/time-entries/?customer_id=1&from={prev}-06-01&to={next}-06-30&limit=1000",
+    "/time-entries/?from={year}-06-01&to={year}-06-30&expand=project,customer",
+    "/time-entries/export?from={year}-12-01&to={next}-01-31",
+    # Inverted ranges across a year boundary match nothing, archived or not.
+    "/time-entries/?from={next}-01-01&to={year}-01-01",
+    "/time-entries/export?from={next}-01-01&to={year}-01-01",
+    "/reports/by-project",
+    "/reports/by-project?from={year}-02-10&to={next}-03-03",
+    "/reports/by-customer",
+    "/reports/by-customer?from={year}-01-01&to={year}-12-31",
+    "/reports/summary?from={prev}-07-01&to={next}-06-30",
+    "/reports/dashboard?recent=50",
+    "/reports/dashboard?recent=50&to={year}-06-30",
+    "/reports/dashboard?recent=50&from={next}-01-01&to={year}-01-01",
+    "/reports/timeseries?bucket=month",
+    "/reports/timeseries?bucket=week&from={year}-10-01&to={next}-03-31",
+]
+# (query, page size) for the keyset walks; every page is compared.
+PAGES = [
+    ("", 500),
+    ("&from={year}-05-01&to={next}-05-01", 250),
+    ("&from={year}-01-01&to={year}-12-31", 333),
+    ("&project_id=1", 100),
+    ("&from={next}-01-01&to={year}-01-01", 100),
+]
+# Terms with fewer matches than search.RANK_CANDIDATES, so paging through them sees every match once.
+SEARCHES = ["Deploy+login+flow", "TM-42&kind=time_entry", "Plan+billing+run&kind=time_entry&kind=project"]
+
+
+def _get(base_url: str, path: str) -> object:
+    status, body = loadgen.request(base_url, "GET", path)
+    if status != 200:
+        raise RuntimeError(f"GET {path}: {status} {body[:200]!r}")
+    return body.decode() if path.startswith("/time-entries/export") else json.loads(body)
+
+
+def _walk(base_url: str, query: str, limit: int) -> list[object]:
+    pages, cursor = [], None
+    while True:
+        path = f"/time-entries/page?limit={limit}&include_total=true{query}" + (f"&cursor={cursor}" if cursor else "")
+        page = _get(base_url, path)
+        pages.append(page)
+        cursor = page["pagination"]["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def _matches(base_url: str, query: str) -> tuple[int, list[tuple[str, int]]]:
+    hits, skip, total = [], 0, None
+    while True:
+        page = _get(base_url, f"/search?q={query}&include_total=true&limit=500&skip={skip}")
+        total = page["pagination"]["total"] if total is None else total
+        if not page["items"]:
+            return total, sorted((hit["kind"], hit["id"]) for hit in hits)
+        hits += page["items"]
+        skip += len(page["items"])
+
+
+def responses(base_url: str, year: int) -> dict[str, object]:
+    fill = {"year": year, "prev": year - 1, "next": year + 1}
+    out = {path.format(**fill): _get(base_url, path.format(**fill)) for path in PATHS}
+    for query, limit in PAGES:
+        out[f"/time-entries/page?limit={limit}{query.format(**fill)}"] = _walk(base_url, query.format(**fill), limit)
+    for query in SEARCHES:
+        out[f"/search?q={query}"] = _matches(base_url, query)
+    return out
+
+
+def rollups(url: str) -> list[tuple]:
+    table = models.TimeEntryRollup.__table__
+    with create_engine(url).connect() as conn:
+        return [tuple(row) for row in conn.execute(select(table).order_by(*table.primary_key.columns))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--year", type=int, default=2023, help=f"year to archive (data covers {START.year} to {START.year + 2})")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        plain, archived = os.path.join(tmp, "plain.db"), os.path.join(tmp, "archived.db")
+        engine = create_engine(f"sqlite:///{plain}")
+        seed(engine, entries=args.entries, start=START, days=DAYS)
+        engine.dispose()
+        shutil.copy(plain, archived)
+
+        engine = create_engine(f"sqlite:///{archived}")
+        with Session(engine) as db:
+            moved = archive.archive_year(db, args.year)
+            db.commit()
+            failures += [f"rollup.verify: {problem}" for problem in rollup.verify(db)]
+        engine.dispose()
+        print(f"archived {args.year}: {moved:,} of {args.entries:,} entries")
+
+        results = {}
+        for name, path in (("plain", plain), ("archived", archived)):
+            with serve({"TIMEMANAGER_DATABASE_URL": f"sqlite:///{path}"}) as base_url:
+                results[name] = responses(base_url, args.year)
+        for path, expected in results["plain"].items():
+            same = results["archived"][path] == expected
+            print(f"[{'ok' if same else 'FAIL':4}] {path}")
+            if not same:
+                failures.append(path)
+        same = rollups(f"sqlite:///{plain}") == rollups(f"sqlite:///{archived}")
+        print(f"[{'ok' if same else 'FAIL':4}] {models.TimeEntryRollup.__tablename__}")
+        if not same:
+            failures.append(models.TimeEntryRollup.__tablename__)
+    if failures:
+        sys.exit(f"archived copy differs: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
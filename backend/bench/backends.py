@@ -0,0 +1,192 @@
+"""Cross-backend check: the API must answer the same on PostgreSQL as on SQLite.
+
+Migrates an empty database at ``--url`` and a throwaway SQLite file from two
+threads at once (the migration lock), seeds both with the same
+``bench.datagen`` data, then serves each and compares reads and a scripted
+series of writes. That runs the PostgreSQL-only code that nothing else
+exercises: the GROUPING SETS summary, ``date_trunc`` timeseries buckets, the
+analytics loader, ``pg_trgm`` search, and the advisory locks of the change
+log, closed periods and migrations. Exits non-zero on any difference.
+
+Timestamps are left out of the comparison (the seeds run at different times),
+floats are compared to 6 decimals, report rows and series are compared as sets
+(ties in hours may come back in either order), and searches by their matches.
+
+    createdb tm_check && python -m bench.backends --url postgresql://tm:tm@localhost/tm_check
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import date
+
+from sqlalchemy import create_engine, inspect
+
+from app import migrations
+from bench import loadgen
+from bench.datagen import seed
+from bench.server import serve
+
+START = date(2022, 1, 1)
+DAYS = 3 * 365
+# Left out of the comparison: set from the clock, or per-process.
+VOLATILE = frozenset({"created_at", "updated_at", "closed_at", "data_version"})
+
+# (path, ordered): unordered responses are compared with their rows sorted.
+READS = [
+    ("/customers/?search=ustomer+1", True),
+    ("/projects/?limit=200", True),
+    ("/departments/", True),
+    ("/time-entries/?limit=500", True),
+    ("/time-entries/?from=2023-02-01&to=2023-03-31&expand=project,customer", True),
+    ("/time-entries/page?limit=300&project_id=1&include_total=true", True),
+    ("/reports/by-project", False),
+    ("/reports/by-customer?from=2022-06-01&to=2023-06-30", False),
+    ("/reports/summary", False),
+    ("/reports/summary?from=2022-03-15&to=2024-02-10", False),
+    ("/reports/dashboard?recent=50", False),
+    ("/reports/timeseries?bucket=day&from=2023-01-01&to=2023-01-31", False),
+    ("/reports/timeseries?bucket=week&from=2022-12-01&to=2023-03-31", False),
+    ("/reports/timeseries?bucket=month", False),
+    # The last buckets and weeks before date.max.
+    ("/reports/timeseries?bucket=week&from=9999-12-01&to=9999-12-31", False),
+    ("/reports/timeseries?bucket=month&from=9999-11-01&to=9999-12-31", False),
+    ("/reports/analytics?capacity=40", True),
+    ("/reports/analytics?from=9999-12-20&to=9999-12-31", True),
+    ("/periods/closed", True),
+]
+# Terms with fewer matches than search.RANK_CANDIDATES, so paging sees every match once.
+SEARCHES = ["Deploy+login+flow", "tm-42&kind=time_entry", "ustomer+4&kind=customer", "Project+1&kind=project"]
+# (method, path, body, expected status); run in order after the reads.
+WRITES = [
+    ("POST", "/time-entries/", {"project_id": 1, "work_date": "2024-06-03", "hours": 1.5, "description": "cross check"}, 201),
+    ("PUT", "/time-entries/{created}", {"hours": 2.5}, 200),
+    ("POST", "/periods/closed", {"month": "2022-03"}, 201),
+    ("POST", "/time-entries/", {"project_id": 1, "work_date": "2022-03-09", "hours": 1.0}, 409),
+    ("POST", "/time-entries/bulk", [{"project_id": 1, "work_date": "2022-03-10", "hours": 1.0},
+                                    {"project_id": 1, "work_date": "2022-04-10", "hours": 1.0}], 200),
+    ("DELETE", "/time-entries/{created}", None, 204),
+    ("POST", "/customers/", {"name": "Cross check"}, 201),
+    ("DELETE", "/periods/closed/2022-03", None, 204),
+]
+AFTER_WRITES = [
+    ("/changes/?since=0", True),
+    ("/reports/summary?from=2022-01-01&to=2022-12-31", False),
+    ("/search?q=cross+check&include_total=true", True),
+]
+
+
+def normalize(value, ordered: bool = True):
+    if isinstance(value, dict):
+        return {k: normalize(v, ordered) for k, v in value.items() if k not in VOLATILE}
+    if isinstance(value, list):
+        items = [normalize(v, ordered) for v in value]
+        return items if ordered else sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def _get(base_url: str, path: str):
+    status, body = loadgen.request(base_url, "GET", path)
+    return status, json.loads(body) if body else None
+
+
+def _matches(base_url: str, query: str):
+    hits, skip, total = [], 0, None
+    while True:
+        status, page = _get(base_url, f"/search?q={query}&include_total=true&limit=500&skip={skip}")
+        if status != 200:
+            return status, page
+        total = page["pagination"]["total"] if total is None else total
+        if not page["items"]:
+            return total, sorted((hit["kind"], hit["id"]) for hit in hits)
+        hits += page["items"]
+        skip += len(page["items"])
+
+
+def responses(base_url: str) -> dict[str, object]:
+    out: dict[str, object] = {}
+    for path, ordered in READS:
+        status, body = _get(base_url, path)
+        out[path] = (status, normalize(body, ordered))
+    for query in SEARCHES:
+        out[f"/search?q={query}"] = _matches(base_url, query)
+    ids: dict[str, object] = {}
+    for step, (method, path, body, expected) in enumerate(WRITES, start=1):
+        path = path.format(**ids)
+        status, raw = loadgen.request(base_url, method, path, body)
+        result = json.loads(raw) if raw else None
+        if method == "POST" and path == "/time-entries/" and status == 201:
+            ids["created"] = result["id"]
+        out[f"{step}. {method} {path}"] = (status, normalize(result), "expected" if status == expected else f"expected {expected}")
+    for path, ordered in AFTER_WRITES:
+        status, body = _get(base_url, path)
+        if path.startswith("/changes"):
+            body = [(c["entity"], c["op"], c["entity_id"]) for c in body]
+        elif path.startswith("/search"):
+            body = sorted((hit["kind"], hit["id"]) for hit in body["items"])
+        out[path] = (status, normalize(body, ordered))
+    return out
+
+
+def prepare(url: str, entries: int) -> None:
+    engine = create_engine(url)
+    if inspect(engine).get_table_names():
+        engine.dispose()
+        sys.exit(f"{engine.url.render_as_string(hide_password=True)} is not empty; the check needs an empty database")
+    # Two runs race on the empty database: one applies every migration, the other waits
+    # on the migration lock and finds nothing left to do.
+    results: list[object] = []
+    threads = [threading.Thread(target=lambda: results.append(_upgrade(engine))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    applied = sorted(len(result) if isinstance(result, list) else -1 for result in results)
+    if applied != [0, len(migrations.MIGRATIONS)]:
+        sys.exit(f"concurrent migration runs on {engine.url.get_backend_name()}: {results}")
+    seed(engine, entries=entries, start=START, days=DAYS)
+    engine.dispose()
+
+
+def _upgrade(engine) -> object:
+    try:
+        return migrations.upgrade(engine)
+    except Exception as exc:  # reported by prepare
+        return repr(exc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", required=True, help="an empty database to check (PostgreSQL)")
+    parser.add_argument("--entries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        reference = f"sqlite:///{os.path.join(tmp, 'reference.db')}"
+        results = {}
+        for name, url in (("sqlite", reference), ("target", args.url)):
+            prepare(url, args.entries)
+            with serve({"TIMEMANAGER_DATABASE_URL": url}) as base_url:
+                results[name] = responses(base_url)
+    for path, expected in results["sqlite"].items():
+        actual = results["target"][path]
+        same = actual == expected and (len(actual) < 3 or actual[2] == "expected")
+        # A write that misbehaves the same way on both backends is still a failure.
+        print(f"[{'ok' if same else 'FAIL':4}] {path}")
+        if not same:
+            failures.append(path)
+            print(f"         sqlite: {json.dumps(expected, default=str)[:300]}")
+            print(f"         target: {json.dumps(actual, default=str)[:300]}")
+    if failures:
+        sys.exit(f"{len(failures)} differences")
+
+
+if __name__ == "__main__":
+    main()
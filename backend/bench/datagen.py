@@ -0,0 +1,189 @@
+"""Synthetic data for benchmarks.
+
+Volumes are skewed the way real tenants are: a few customers own most of the
+projects, a few projects get most of the hours (Zipf-distributed with exponent
+``skew``), entries cluster on weekdays and grow towards the end of the range,
+and descriptions reuse a small vocabulary plus ticket numbers so search has
+both common and rare terms to find.
+
+    python -m bench.datagen --url sqlite:///./bench.db --entries 1000000
+    python -m bench.datagen --customers 5000 --departments 2000 --projects 20000 --entries 20000000
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import migrations, models, rollup, search
+
+CHUNK = 20_000
+
+HOURS = (0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 4.0, 7.5, 8.0)
+HOURS_WEIGHTS = (4, 10, 20, 10, 15, 8, 12, 6, 5)
+VERBS = ("Fix", "Review", "Implement", "Deploy", "Plan", "Document", "Test", "Refactor", "Support", "Meet about")
+NOUNS = (
+    "invoice export", "login flow", "report filters", "onboarding", "billing run", "search page",
+    "API rate limits", "dashboard", "data migration", "mobile layout", "release notes", "backlog",
+)
+
+
+def _zipf_cum_weights(n: int, skew: float) -> list[float]:
+    return list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, n + 1)))
+
+
+def _date_cum_weights(start: date, days: int) -> list[float]:
+    # Weekends get a tenth of a weekday's entries; volume doubles from the first to the last day.
+    weights = []
+    for offset in range(days):
+        weekday = (start + timedelta(days=offset)).weekday()
+        weights.append((1.0 if weekday < 5 else 0.1) * (1.0 + offset / max(days - 1, 1)))
+    return list(itertools.accumulate(weights))
+
+
+def _description(rng: random.Random) -> str | None:
+    roll = rng.random()
+    if roll < 0.3:
+        return None
+    description = f"{rng.choice(VERBS)} {rng.choice(NOUNS)}"
+    if roll < 0.6:
+        description += f" (TM-{rng.randrange(1, 100_000)})"
+    return description
+
+
+def seed(
+    engine: Engine,
+    customers: int = 50,
+    projects: int = 500,
+    entries: int = 100_000,
+    start: date = date(2022, 1, 1),
+    days: int = 3 * 365,
+    rng_seed: int = 1,
+    departments: int = 20,
+    skew: float = 1.1,
+    progress: bool = False,
+) -> None:
+    """Create the schema on ``engine`` and fill it with skewed random customers, departments, projects and entries."""
+    rng = random.Random(rng_seed)
+    migrations.upgrade(engine)
+    now = datetime.utcnow()
+    customer_weights = _zipf_cum_weights(customers, skew)
+    customer_ids = list(range(1, customers + 1))
+
+    department_rows = []
+    departments_by_customer: dict[int, list[int]] = {}
+    for i, customer_id in enumerate(rng.choices(customer_ids, cum_weights=customer_weights, k=departments), start=1):
+        department_rows.append({"id": i, "name": f"Department {i}", "customer_id": customer_id})
+        departments_by_customer.setdefault(customer_id, []).append(i)
+
+    project_rows = []
+    for i, customer_id in enumerate(rng.choices(customer_ids, cum_weights=customer_weights, k=projects), start=1):
+        owned = departments_by_customer.get(customer_id)
+        department_id = rng.choice(owned) if owned and rng.random() < 0.7 else None
+        project_rows.append(
+            {
+                "id": i,
+                "name": f"Project {i}",
+                "customer_id": customer_id,
+                "department_id": department_id,
+                "active": rng.random() < 0.9,
+            }
+        )
+
+    with Session(engine) as db:
+        db.execute(
+            insert(models.Customer),
+            [{"id": i, "name": f"Customer {i}", "active": True, "created_at": now} for i in customer_ids],
+        )
+        if department_rows:
+            db.execute(insert(models.Department), department_rows)
+        db.execute(insert(models.Project), project_rows)
+        if engine.dialect.name == "postgresql":
+            # Explicit ids bypass the serial sequences; move them past the seeded rows.
+            for table in ("customers", "departments", "projects"):
+                db.execute(
+                    text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"GREATEST((SELECT MAX(id) FROM {table}), 1))"
+                    )
+                )
+
+        if engine.dialect.name == "sqlite":
+            # Indexing the FTS table row by row through the trigger dominates load time;
+            # create_index() below restores the trigger and rebuilds the index in one pass.
+            db.execute(text("DROP TRIGGER IF EXISTS time_entries_fts_ai"))
+
+        # Popular projects are spread across the id range rather than being the lowest ids.
+        project_ids = [row["id"] for row in project_rows]
+        rng.shuffle(project_ids)
+        project_weights = _zipf_cum_weights(projects, skew)
+        all_dates = [start + timedelta(days=offset) for offset in range(days)]
+        date_weights = _date_cum_weights(start, days)
+        table = models.TimeEntry.__table__
+        started = time.perf_counter()
+        remaining = entries
+        while remaining > 0:
+            batch = min(CHUNK, remaining)
+            picked_projects = rng.choices(project_ids, cum_weights=project_weights, k=batch)
+            picked_dates = rng.choices(all_dates, cum_weights=date_weights, k=batch)
+            picked_hours = rng.choices(HOURS, weights=HOURS_WEIGHTS, k=batch)
+            db.execute(
+                table.insert(),
+                [
+                    {
+                        "project_id": project_id,
+                        "work_date": work_date,
+                        "hours": hours,
+                        "description": _description(rng),
+                        "billable": rng.random() < 0.8,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for project_id, work_date, hours in zip(picked_projects, picked_dates, picked_hours)
+                ],
+            )
+            remaining -= batch
+            if progress:
+                done = entries - remaining
+                rate = done / (time.perf_counter() - started)
+                print(f"\r{done:,}/{entries:,} entries ({rate:,.0f}/s)", end="", file=sys.stderr, flush=True)
+        if progress:
+            print(file=sys.stderr)
+        search.create_index(db.connection())
+        rollup.rebuild(db)
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic time entries.")
+    parser.add_argument("--url", default="sqlite:///./bench.db")
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--departments", type=int, default=20)
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for customer/project popularity")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    seed(
+        create_engine(args.url),
+        customers=args.customers,
+        projects=args.projects,
+        entries=args.entries,
+        days=args.days,
+        rng_seed=args.seed,
+        departments=args.departments,
+        skew=args.skew,
+        progress=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
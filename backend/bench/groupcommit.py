@@ -0,0 +1,76 @@
+"""Write throughput with and without group commit.
+
+Starts the API once per mode (``TIMEMANAGER_GROUP_COMMIT`` off and on, each
+on a fresh SQLite file unless ``--url`` is given) and, for each ``--clients``
+count, has that many threads POST single time entries for ``--duration``
+seconds. Reports writes/s and latency per mode and client count.
+
+    python -m bench.groupcommit
+    python -m bench.groupcommit --clients 1 --clients 10 --clients 100 --window-ms 5
+    python -m bench.groupcommit --url postgresql://tm:tm@localhost/tm
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+from datetime import date, timedelta
+
+from bench import loadgen
+from bench.server import serve
+
+
+def writers(base_url: str, clients: int) -> list[tuple[str, object]]:
+    project_id = loadgen.ensure_project(base_url)
+    rng = random.Random()
+
+    def write() -> int:
+        entry = {
+            "project_id": project_id,
+            "work_date": (date(2024, 1, 1) + timedelta(days=rng.randrange(365))).isoformat(),
+            "hours": 1.0,
+        }
+        return loadgen.request(base_url, "POST", "/time-entries/", entry)[0]
+
+    return [("write", write)] * clients
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="database to write to (default: a fresh SQLite file per mode)")
+    parser.add_argument("--profile", default="production", choices=["default", "production"])
+    parser.add_argument("--clients", type=int, action="append", help="concurrent writers (default: 1, 10, 100)")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=100)
+    args = parser.parse_args()
+
+    counts = args.clients or [1, 10, 100]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("off", "on"):
+            env = {
+                "TIMEMANAGER_DATABASE_URL": args.url or f"sqlite:///{tmp}/group-commit-{mode}.db",
+                "TIMEMANAGER_ENGINE_PROFILE": args.profile,
+                "TIMEMANAGER_GROUP_COMMIT": "true" if mode == "on" else "false",
+                "TIMEMANAGER_GROUP_COMMIT_WINDOW_MS": str(args.window_ms),
+                "TIMEMANAGER_GROUP_COMMIT_MAX_BATCH": str(args.max_batch),
+            }
+            with serve(env) as base_url:
+                for clients in counts:
+                    stats = loadgen.run(base_url, writers(base_url, clients), args.duration)
+                    results[mode, clients] = loadgen.summarize(stats, args.duration)["write"]
+
+    print(f"group commit window {args.window_ms} ms, max batch {args.max_batch}")
+    for clients in counts:
+        off, on = results["off", clients], results["on", clients]
+        for mode, s in (("off", off), ("on", on)):
+            print(
+                f"{clients:4} clients  group commit {mode:3}  {s['rps']:8.1f} writes/s"
+                f"  p50 {s['p50_ms']:8.2f} ms  p99 {s['p99_ms']:8.2f} ms  {s['errors']:5.0f} err"
+            )
+        print(f"{'':4}          speedup {on['rps'] / off['rps'] if off['rps'] else 0.0:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Minimal HTTP load generator for a running API server.
+
+Each worker thread repeatedly runs its operation until the duration elapses;
+latencies are reported per operation as throughput, p50 and p99.
+
+    TIMEMANAGER_ENGINE_PROFILE=production uvicorn app.main:app --port 8000
+    python -m bench.loadgen --url http://127.0.0.1:8000 --readers 16 --writers 4
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable
+
+
+def request(base_url: str, method: str, path: str, body: object | None = None) -> tuple[int, bytes]:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.read()
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, op: str, millis: float, ok: bool) -> None:
+        with self.lock:
+            self.latencies[op].append(millis)
+            if not ok:
+                self.errors[op] += 1
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(base_url: str, workers: list[tuple[str, Callable[[], int]]], duration: float) -> Stats:
+    """Run each ``(op, fn)`` worker in its own thread for ``duration`` seconds."""
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+
+    def loop(op: str, fn: Callable[[], int]) -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status = fn()
+            stats.record(op, (time.perf_counter() - started) * 1000, status < 400)
+
+    threads = [threading.Thread(target=loop, args=worker, daemon=True) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def summarize(stats: Stats, duration: float) -> dict[str, dict[str, float]]:
+    return {
+        op: {
+            "requests": len(samples),
+            "errors": stats.errors.get(op, 0),
+            "rps": len(samples) / duration,
+            "p50_ms": percentile(samples, 50),
+            "p99_ms": percentile(samples, 99),
+        }
+        for op, samples in sorted(stats.latencies.items())
+    }
+
+
+def print_summary(summary: dict[str, dict[str, float]]) -> None:
+    for op, s in summary.items():
+        print(
+            f"{op:24} {s['requests']:7.0f} req  {s['errors']:5.0f} err  {s['rps']:8.1f} req/s"
+            f"  p50 {s['p50_ms']:8.2f} ms  p99 {s['p99_ms']:8.2f} ms"
+        )
+
+
+def ensure_project(base_url: str) -> int:
+    status, body = request(base_url, "POST", "/customers/", {"name": f"loadgen-{time.time_ns()}"})
+    customer = json.loads(body)
+    status, body = request(base_url, "POST", "/projects/", {"name": "loadgen", "customer_id": customer["id"]})
+    return json.loads(body)["id"]
+
+
+def mixed_workers(base_url: str, readers: int, writers: int) -> list[tuple[str, Callable[[], int]]]:
+    project_id = ensure_project(base_url)
+    rng = random.Random()
+
+    def read() -> int:
+        path = rng.choice(("/time-entries/?limit=50", "/reports/by-project", "/reports/by-customer"))
+        return request(base_url, "GET", path)[0]
+
+    def write() -> int:
+        entry = {
+            "project_id": project_id,
+            "work_date": (date(2024, 1, 1) + timedelta(days=rng.randrange(365))).isoformat(),
+            "hours": 1.0,
+        }
+        return request(base_url, "POST", "/time-entries/", entry)[0]
+
+    return [("read", read)] * readers + [("write", write)] * writers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mixed read/write load against a running server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    stats = run(args.url, mixed_workers(args.url, args.readers, args.writers), args.duration)
+    print_summary(summarize(stats, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Compare API throughput across database backends / engine settings.
+
+Starts one server per ``--mode NAME=DATABASE_URL`` (a fresh SQLite file when no
+URL is given) and runs the same mixed read/write load against each.
+
+    python -m bench.modes --mode sqlite --mode postgres=postgresql://tm:tm@localhost/tm
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+
+from bench import loadgen
+from bench.server import serve
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", action="append", default=[], help="NAME or NAME=DATABASE_URL")
+    parser.add_argument("--profile", default="production", choices=["default", "production"])
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--writers", type=int, default=8)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.mode or ["sqlite"]:
+            name, _, url = mode.partition("=")
+            env = {
+                "TIMEMANAGER_DATABASE_URL": url or f"sqlite:///{tmp}/{name}.db",
+                "TIMEMANAGER_ENGINE_PROFILE": args.profile,
+            }
+            with serve(env) as base_url:
+                workers = loadgen.mixed_workers(base_url, args.readers, args.writers)
+                stats = loadgen.run(base_url, workers, args.duration)
+            results[name] = loadgen.summarize(stats, args.duration)
+
+    for name, summary in results.items():
+        print(f"== {name}")
+        loadgen.print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
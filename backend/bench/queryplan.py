@@ -0,0 +1,135 @@
+"""Query plan regression check for the router queries.
+
+Seeds a throwaway SQLite database, calls each list/report handler directly while
+recording the SQL it emits, and runs ``EXPLAIN QUERY PLAN`` on every statement.
+Exits non-zero if any plan falls back to a full scan of a large table.
+
+    python -m bench.queryplan --entries 200000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from datetime import date
+from typing import Awaitable, Callable
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import search
+from app.pagination import encode_cursor
+from app.routers import customers, departments, projects, reports, time_entries
+from bench.datagen import seed
+
+LARGE_TABLES = ("time_entries", "time_entry_rollups")
+FULL_SCAN = re.compile(rf"^SCAN ({'|'.join(LARGE_TABLES)})$")
+
+FROM, TO = date(2023, 1, 1), date(2023, 3, 31)
+
+
+def _request(url: str) -> Request:
+    path, _, query = url.partition("?")
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": []})
+
+
+CASES: dict[str, Callable[[AsyncSession], Awaitable]] = {
+    "time-entries list": lambda db: time_entries.list_time_entries(
+        project_id=None, customer_id=None, from_date=None, to_date=None, skip=0, limit=100, expand=None, db=db
+    ),
+    "time-entries list by project": lambda db: time_entries.list_time_entries(
+        project_id=7, customer_id=None, from_date=None, to_date=None, skip=0, limit=100, expand=None, db=db
+    ),
+    "time-entries list by customer": lambda db: time_entries.list_time_entries(
+        project_id=None, customer_id=3, from_date=FROM, to_date=TO, skip=0, limit=100, expand=None, db=db
+    ),
+    "time-entries list by date": lambda db: time_entries.list_time_entries(
+        project_id=None, customer_id=None, from_date=FROM, to_date=TO, skip=0, limit=100, expand=None, db=db
+    ),
+    "time-entries list expanded": lambda db: time_entries.list_time_entries(
+        project_id=None, customer_id=None, from_date=FROM, to_date=TO, skip=0, limit=100,
+        expand="project,customer", db=db,
+    ),
+    "time-entries page after cursor": lambda db: time_entries.page_time_entries(
+        project_id=None, customer_id=None, from_date=None, to_date=None,
+        cursor=encode_cursor([date(2023, 6, 1), 10**9]), limit=100, include_total=False, expand=None, db=db,
+    ),
+    "time-entries page expanded": lambda db: time_entries.page_time_entries(
+        project_id=7, customer_id=None, from_date=None, to_date=None,
+        cursor=None, limit=100, include_total=False, expand="project,customer", db=db,
+    ),
+    "reports by-project range": lambda db: reports.report_by_project(from_date=FROM, to_date=TO, db=db),
+    "reports by-customer range": lambda db: reports.report_by_customer(from_date=FROM, to_date=TO, db=db),
+    "reports dashboard range": lambda db: reports.report_dashboard(from_date=FROM, to_date=TO, recent=10, db=db),
+    "search": lambda db: search.search(db, "review", list(search.SOURCES), skip=0, limit=20),
+    "customers list": lambda db: customers.list_customers(_request("/customers/"), skip=0, limit=100, search=None, active=None, db=db),
+    "customers search": lambda db: customers.list_customers(
+        _request("/customers/?search=cust"), skip=0, limit=100, search="cust", active=None, db=db
+    ),
+    "projects list by customer": lambda db: projects.list_projects(
+        _request("/projects/"), customer_id=3, department_id=None, active=None, skip=0, limit=100, db=db
+    ),
+    "departments list": lambda db: db.run_sync(
+        lambda sync_db: departments.list_departments(_request("/departments/"), customer_id=None, skip=0, limit=100, db=sync_db)
+    ),
+}
+
+
+async def check(db: AsyncSession) -> list[str]:
+    statements: list[tuple[str, object]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    bind = db.bind.sync_engine
+    failures = []
+    for name, case in CASES.items():
+        statements.clear()
+        event.listen(bind, "before_cursor_execute", record)
+        try:
+            await case(db)
+        finally:
+            event.remove(bind, "before_cursor_execute", record)
+        for statement, parameters in statements:
+            conn = await db.connection()
+            plan = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+            details = [row[-1] for row in plan]
+            scans = [d for d in details if FULL_SCAN.match(d)]
+            status = "FAIL" if scans else "ok"
+            print(f"[{status:4}] {name}: {' | '.join(details)}")
+            if scans:
+                failures.append(f"{name}: {', '.join(scans)}")
+    return failures
+
+
+async def run(path: str) -> list[str]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with AsyncSession(engine) as db:
+        await db.execute(text("ANALYZE"))
+        failures = await check(db)
+    await engine.dispose()
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plan.db")
+        engine = create_engine(f"sqlite:///{path}")
+        seed(engine, entries=args.entries)
+        engine.dispose()
+        failures = asyncio.run(run(path))
+    for failure in failures:
+        print(f"full table scan: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
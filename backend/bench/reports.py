@@ -0,0 +1,101 @@
+"""Compare the rollup-backed report queries with the raw three-way join.
+
+    python -m bench.reports --entries 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app import models
+from app.routers import reports
+from bench.datagen import seed
+
+
+def raw_by_project(db: Session, from_date: date | None, to_date: date | None):
+    query = (
+        db.query(
+            models.Project.id,
+            models.Project.name,
+            models.Customer.id,
+            models.Customer.name,
+            func.sum(models.TimeEntry.hours),
+        )
+        .join(models.TimeEntry, models.TimeEntry.project_id == models.Project.id)
+        .join(models.Customer, models.Customer.id == models.Project.customer_id)
+        .group_by(models.Project.id, models.Project.name, models.Customer.id, models.Customer.name)
+        .order_by(func.sum(models.TimeEntry.hours).desc())
+    )
+    if from_date is not None:
+        query = query.filter(models.TimeEntry.work_date >= from_date)
+    if to_date is not None:
+        query = query.filter(models.TimeEntry.work_date <= to_date)
+    return query.all()
+
+
+def raw_by_customer(db: Session, from_date: date | None, to_date: date | None):
+    query = (
+        db.query(models.Customer.id, models.Customer.name, func.sum(models.TimeEntry.hours))
+        .join(models.Project, models.Project.customer_id == models.Customer.id)
+        .join(models.TimeEntry, models.TimeEntry.project_id == models.Project.id)
+        .group_by(models.Customer.id, models.Customer.name)
+        .order_by(func.sum(models.TimeEntry.hours).desc())
+    )
+    if from_date is not None:
+        query = query.filter(models.TimeEntry.work_date >= from_date)
+    if to_date is not None:
+        query = query.filter(models.TimeEntry.work_date <= to_date)
+    return query.all()
+
+
+async def timed(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def run(path: str, repeat: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    ranges = {"all time": (None, None), "one quarter": (date(2023, 1, 1), date(2023, 3, 31))}
+    async with AsyncSession(engine) as db:
+        for label, (lo, hi) in ranges.items():
+            cases = {
+                "by-project raw": lambda: db.run_sync(raw_by_project, lo, hi),
+                "by-project rollup": lambda: reports.report_by_project(from_date=lo, to_date=hi, db=db),
+                "by-customer raw": lambda: db.run_sync(raw_by_customer, lo, hi),
+                "by-customer rollup": lambda: reports.report_by_customer(from_date=lo, to_date=hi, db=db),
+            }
+            for name, fn in cases.items():
+                samples = await timed(fn, repeat)
+                print(f"{label:12} {name:20} median {statistics.median(samples):8.2f} ms  max {max(samples):8.2f} ms")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        seed(engine, entries=args.entries)
+        engine.dispose()
+        asyncio.run(run(path, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Read throughput against the number of server workers.
+
+Seeds a database (or reuses ``--url``), then for each ``--workers`` count
+starts the API through ``app.serve`` and drives the read scenarios from
+``--clients`` load-generator processes (so the client is not limited by one
+interpreter's GIL). Reports requests/s, the speedup over one worker and the
+scaling efficiency (speedup / workers); ``--min-efficiency`` turns the last
+into a pass/fail check. Clients and workers share the machine, so leave cores
+for the clients: on N cores, expect near-linear scaling up to about N/2 workers.
+
+    python -m bench.scaling --entries 200000 --workers 1 --workers 2 --workers 4
+    python -m bench.scaling --url postgresql://tm:tm@localhost/tm --reuse --min-efficiency 0.8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import create_engine
+
+from bench import loadgen
+from bench.datagen import seed
+from bench.server import serve
+from bench.suite import Dataset, scenarios
+
+# Cached listings, indexed entry reads and rollup-backed reports.
+READ_SCENARIOS = (
+    "customers.list",
+    "projects.list.customer",
+    "time-entries.list.project",
+    "time-entries.page.deep-cursor",
+    "reports.by-customer",
+    "reports.dashboard",
+)
+
+
+def _client(base_url: str, data: Dataset, threads: int, duration: float, client_seed: int) -> tuple[int, int, list[float]]:
+    """One load-generator process: ``threads`` threads cycling through the read scenarios."""
+    rng = random.Random(client_seed)
+    selected = [s for s in scenarios(data) if s.name in READ_SCENARIOS]
+    fns = [s.build(base_url, data, random.Random(rng.random())) for s in selected]
+
+    def mixed() -> int:
+        return rng.choice(fns)()
+
+    stats = loadgen.run(base_url, [("read", mixed)] * threads, duration)
+    latencies = stats.latencies.get("read", [])
+    return len(latencies), stats.errors.get("read", 0), latencies
+
+
+def measure(base_url: str, data: Dataset, clients: int, threads: int, duration: float, warmup: float) -> dict[str, float]:
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        if warmup > 0:
+            list(pool.map(_client, *zip(*[(base_url, data, threads, warmup, i) for i in range(clients)])))
+        results = list(pool.map(_client, *zip(*[(base_url, data, threads, duration, i) for i in range(clients)])))
+    latencies = [ms for _, _, samples in results for ms in samples]
+    return {
+        "requests": sum(r[0] for r in results),
+        "errors": sum(r[1] for r in results),
+        "rps": sum(r[0] for r in results) / duration,
+        "p50_ms": loadgen.percentile(latencies, 50),
+        "p99_ms": loadgen.percentile(latencies, 99),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="database to benchmark (default: a fresh seeded SQLite file)")
+    parser.add_argument("--reuse", action="store_true", help="benchmark --url as is instead of seeding it")
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--profile", default="production", choices=["default", "production"])
+    parser.add_argument("--workers", type=int, action="append", help="worker counts to run (default: 1, 2, 4, ... up to the cores)")
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="load-generator processes")
+    parser.add_argument("--threads", type=int, default=8, help="threads per load-generator process")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--min-efficiency", type=float, help="exit 1 if any run scales worse than this")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    counts = args.workers or [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cores] or [1]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'scaling.db')}"
+        if not args.reuse:
+            engine = create_engine(url)
+            seed(engine, customers=500, departments=100, projects=2_000, entries=args.entries, progress=True)
+            engine.dispose()
+        data = Dataset.load(url)
+        env = {"TIMEMANAGER_DATABASE_URL": url, "TIMEMANAGER_ENGINE_PROFILE": args.profile}
+        for workers in counts:
+            with serve(env, workers=workers) as base_url:
+                results[workers] = measure(base_url, data, args.clients, args.threads, args.duration, args.warmup)
+
+    base = results[counts[0]]["rps"] / counts[0]
+    failed = False
+    print(f"{cores} cores, {args.clients} client processes x {args.threads} threads")
+    for workers, r in results.items():
+        speedup = r["rps"] / base if base else 0.0
+        efficiency = speedup / workers
+        failed |= args.min_efficiency is not None and efficiency < args.min_efficiency
+        print(
+            f"{workers:3} workers {r['rps']:9.1f} req/s  speedup {speedup:5.2f}  efficiency {efficiency:4.0%}"
+            f"  p50 {r['p50_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms  {r['errors']:4.0f} err"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
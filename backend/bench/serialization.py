@@ -0,0 +1,83 @@
+"""Rows/sec of the time entry listing: ORM entities + response_model vs. columns + orjson.
+
+The "entities" path reproduces what FastAPI does with a ``response_model``
+(validate the ORM objects into the schema, serialize, ``json.dumps``); the
+"columns" path is the one the listing endpoints use now. Both run the same
+query on the same data and their JSON bodies are checked to be identical.
+
+    python -m bench.serialization --entries 200000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import models, schemas
+from app.routers.time_entries import ENTRY_COLUMNS
+from app.serialization import json_response, row_dicts
+from bench.datagen import seed
+
+ORDER = (models.TimeEntry.work_date.desc(), models.TimeEntry.id.desc())
+
+
+async def via_entities(db: AsyncSession, field, limit: int) -> bytes:
+    rows = (await db.scalars(select(models.TimeEntry).order_by(*ORDER).limit(limit))).all()
+    content = await serialize_response(field=field, response_content=rows, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def via_columns(db: AsyncSession, limit: int) -> bytes:
+    rows = (await db.execute(select(*ENTRY_COLUMNS).order_by(*ORDER).limit(limit))).all()
+    return json_response(row_dicts(rows)).body
+
+
+async def run(path: str, sizes: list[int], repeat: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    field = create_response_field(name="Response_list_time_entries", type_=List[schemas.TimeEntryOut])
+    paths = {"entities": lambda db, n: via_entities(db, field, n), "columns": via_columns}
+    for limit in sizes:
+        bodies = {}
+        for name, fn in paths.items():
+            samples = []
+            for _ in range(repeat):
+                # A fresh session per run, as per request, so the identity map starts empty.
+                async with AsyncSession(engine) as db:
+                    started = time.perf_counter()
+                    bodies[name] = await fn(db, limit)
+                    samples.append(time.perf_counter() - started)
+            median = statistics.median(samples)
+            print(f"limit {limit:6}  {name:9} {median * 1000:9.2f} ms  {limit / median:12,.0f} rows/s")
+        if json.loads(bodies["entities"]) != json.loads(bodies["columns"]):
+            raise SystemExit(f"bodies differ at limit {limit}")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--limit", type=int, action="append", help="page sizes (default 100, 1000, 10000)")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        seed(engine, entries=args.entries)
+        engine.dispose()
+        asyncio.run(run(path, args.limit or [100, 1_000, 10_000], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
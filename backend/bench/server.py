@@ -0,0 +1,50 @@
+"""Run the API in a uvicorn subprocess for the HTTP benchmarks."""
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(env: dict[str, str] | None = None, workers: int = 1, cwd: str | None = None) -> Iterator[str]:
+    """Start ``app.main:app`` with extra environment variables and yield its base URL.
+
+    Several workers are started through ``app.serve``, the supported multi-process mode.
+    """
+    port = _free_port()
+    if workers > 1:
+        cmd = [sys.executable, "-m", "app.serve", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+    process_env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR), **(env or {})}
+    process = subprocess.Popen(cmd, cwd=cwd or BACKEND_DIR, env=process_env)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(url + "/docs", timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"server exited or did not start: {' '.join(cmd)}")
+                time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
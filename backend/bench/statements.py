@@ -0,0 +1,113 @@
+"""Statement-count check for the write endpoints.
+
+Drives every create/update/delete endpoint once through the ASGI app against a
+throwaway SQLite database (or ``--url``) and counts the SQL statements each
+request executes. Exits non-zero if any endpoint goes over its budget, which
+catches a reintroduced existence check, refresh or ORM cascade load.
+
+    python -m bench.statements
+    python -m bench.statements --url postgresql://localhost/timemanager_bench
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+
+# (name, method, path template, JSON body template, budget). Templates are filled
+# from the ids created by earlier steps.
+STEPS = [
+    ("create customer", "POST", "/customers/", {"name": "Customer {tag}"}, 2),
+    ("update customer", "PUT", "/customers/{customer}", {"notes": "updated"}, 2),
+    ("create department", "POST", "/departments/", {"name": "Department", "customer_id": "{customer}"}, 1),
+    ("update department", "PUT", "/departments/{department}", {"name": "Renamed"}, 1),
+    ("create project", "POST", "/projects/", {"name": "Project", "customer_id": "{customer}", "department_id": "{department}"}, 2),
+    ("update project", "PUT", "/projects/{project}", {"active": False}, 2),
+    # period lock, closed-period check, insert, rollup upsert, change log
+    ("create time entry", "POST", "/time-entries/", {"project_id": "{project}", "work_date": "2024-01-01", "hours": 1.5}, 5),
+    # load, period lock, closed-period check, update, rollup delta, change log
+    ("update time entry hours", "PUT", "/time-entries/{entry}", {"hours": 2.5}, 6),
+    # as above, but moving to another rollup bucket costs a decrement, cleanup and increment
+    ("move time entry", "PUT", "/time-entries/{entry}", {"work_date": "2024-01-02"}, 8),
+    ("delete time entry", "DELETE", "/time-entries/{entry}", None, 6),
+    ("delete department", "DELETE", "/departments/{department}", None, 1),
+    # Entries, rollups and snapshots go by ON DELETE CASCADE, whatever their number.
+    ("delete project", "DELETE", "/projects/{project}", None, 2),
+    ("delete customer", "DELETE", "/customers/{customer}", None, 2),
+]
+IDS = {
+    "create customer": "customer",
+    "create department": "department",
+    "create project": "project",
+    "create time entry": "entry",
+}
+
+
+def _fill(template, ids: dict[str, object]):
+    if isinstance(template, dict):
+        return {key: _fill(value, ids) for key, value in template.items()}
+    if isinstance(template, str):
+        if template.startswith("{") and template.endswith("}") and template[1:-1] in ids:
+            return ids[template[1:-1]]
+        return template.format(**ids)
+    return template
+
+
+def run(extra_entries: int) -> list[str]:
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.database import async_engine, engine
+    from app.main import app
+
+    statements: list[str] = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for bind in (engine, async_engine.sync_engine):
+        event.listen(bind, "before_cursor_execute", count)
+    # PostgreSQL takes an advisory lock before writing to the change log (departments are not logged).
+    lock = 1 if engine.dialect.name == "postgresql" else 0
+
+    failures = []
+    ids: dict[str, object] = {"tag": uuid.uuid4().hex[:8]}
+    with TestClient(app) as client:
+        for name, method, path, body, budget in STEPS:
+            if name == "delete project" and extra_entries:
+                # The project delete must not scale with the number of entries.
+                rows = [{"project_id": ids["project"], "work_date": "2024-02-01", "hours": 1}] * extra_entries
+                client.post("/time-entries/bulk", json=rows).raise_for_status()
+            statements.clear()
+            response = client.request(method, _fill(path, ids), json=_fill(body, ids))
+            response.raise_for_status()
+            executed = len(statements)
+            allowed = budget if path.startswith("/departments") else budget + lock
+            status = "ok" if executed <= allowed else "FAIL"
+            print(f"[{status:4}] {name:24} {executed:2} statements (budget {allowed})")
+            if executed > allowed:
+                failures.append(name)
+                for statement in statements:
+                    print(f"         {' '.join(statement.split())[:120]}")
+            if name in IDS:
+                ids[IDS[name]] = response.json()["id"]
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="database to run against (default: a temporary SQLite file)")
+    parser.add_argument("--entries", type=int, default=1000, help="entries under the project deleted last")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TIMEMANAGER_DATABASE_URL"] = args.url or f"sqlite:///{os.path.join(tmp, 'statements.db')}"
+        failures = run(args.entries)
+    if failures:
+        sys.exit(f"over budget: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
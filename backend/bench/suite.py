@@ -0,0 +1,298 @@
+"""Endpoint benchmark suite with stored baselines.
+
+Seeds a database with ``bench.datagen`` (or reuses ``--url``), starts the API
+with ``bench.server`` and drives every scenario below for ``--duration``
+seconds from ``--concurrency`` client threads, reporting throughput, p50 and
+p99 per scenario. ``--save`` writes the results as a JSON baseline and
+``--compare`` flags scenarios that got slower than a baseline by more than
+``--tolerance`` (exit code 1 if any did).
+
+    python -m bench.suite --entries 1000000 --save bench/baselines/local.json
+    python -m bench.suite --entries 1000000 --compare bench/baselines/local.json
+    python -m bench.suite --only reports --only search --duration 10
+
+Read scenarios run first; the write scenarios that follow modify the seeded data.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, func, select
+
+from app import models
+from app.pagination import encode_cursor
+from bench import loadgen
+from bench.datagen import seed
+from bench.server import serve
+
+
+@dataclass
+class Dataset:
+    """Id ranges and dates of the seeded data, used to build realistic request parameters."""
+
+    customers: int
+    projects: int
+    max_entry_id: int
+    first_day: date
+    last_day: date
+
+    @classmethod
+    def load(cls, url: str) -> Dataset:
+        engine = create_engine(url)
+        with engine.connect() as conn:
+            customers = conn.scalar(select(func.max(models.Customer.id))) or 0
+            projects = conn.scalar(select(func.max(models.Project.id))) or 0
+            max_entry_id = conn.scalar(select(func.max(models.TimeEntry.id))) or 0
+            first_day, last_day = conn.execute(
+                select(func.min(models.TimeEntry.work_date), func.max(models.TimeEntry.work_date))
+            ).one()
+        engine.dispose()
+        if not max_entry_id:
+            raise SystemExit(f"{url} has no time entries; seed it first or drop --reuse")
+        return cls(customers, projects, max_entry_id, _as_date(first_day), _as_date(last_day))
+
+    def day(self, rng: random.Random) -> date:
+        return self.first_day + timedelta(days=rng.randrange((self.last_day - self.first_day).days + 1))
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+class Scenario:
+    def __init__(self, name: str, build: Callable[[str, Dataset, random.Random], Callable[[], int]]):
+        self.name = name
+        self.build = build
+
+
+def get(path: Callable[[Dataset, random.Random], str]):
+    def build(base_url: str, data: Dataset, rng: random.Random) -> Callable[[], int]:
+        return lambda: loadgen.request(base_url, "GET", path(data, rng))[0]
+
+    return build
+
+
+def send(method: str, path: Callable[[Dataset, random.Random], str], body: Callable[[Dataset, random.Random], object]):
+    def build(base_url: str, data: Dataset, rng: random.Random) -> Callable[[], int]:
+        return lambda: loadgen.request(base_url, method, path(data, rng), body(data, rng))[0]
+
+    return build
+
+
+def _unique(prefix: str) -> str:
+    return f"{prefix} {time.time_ns()}-{threading.get_ident()}"
+
+
+def _entry(data: Dataset, rng: random.Random) -> dict:
+    return {
+        "project_id": rng.randint(1, data.projects),
+        "work_date": data.day(rng).isoformat(),
+        "hours": rng.choice((0.5, 1.0, 2.0)),
+        "description": "bench entry",
+    }
+
+
+def _range(data: Dataset, rng: random.Random, days: int) -> str:
+    start = data.day(rng)
+    return f"from={start.isoformat()}&to={(start + timedelta(days=days)).isoformat()}"
+
+
+def _deep_cursor(data: Dataset, rng: random.Random) -> str:
+    # A cursor halfway back through the history, as if the client had paged that far.
+    middle = data.first_day + (data.last_day - data.first_day) / 2
+    return quote(encode_cursor([middle, data.max_entry_id + 1]))
+
+
+def _delete_path(ids: itertools.count) -> Callable[[Dataset, random.Random], str]:
+    return lambda data, rng: f"/time-entries/{next(ids)}"
+
+
+def scenarios(data: Dataset) -> list[Scenario]:
+    # Seeded entries are deleted from the highest id down, so each delete hits a live row.
+    delete_ids = itertools.count(data.max_entry_id, -1)
+    bulk_rows = 100
+    return [
+        Scenario("customers.list", get(lambda d, r: "/customers/?limit=100")),
+        Scenario("customers.search", get(lambda d, r: f"/customers/?search=omer%20{r.randint(1, d.customers)}")),
+        Scenario("customers.page", get(lambda d, r: "/customers/page?limit=100")),
+        Scenario("customers.get", get(lambda d, r: f"/customers/{r.randint(1, d.customers)}")),
+        Scenario("departments.list", get(lambda d, r: "/departments/?limit=100")),
+        Scenario("departments.page", get(lambda d, r: "/departments/page?limit=100")),
+        Scenario("projects.list.customer", get(lambda d, r: f"/projects/?customer_id={r.randint(1, d.customers)}")),
+        Scenario("projects.page", get(lambda d, r: "/projects/page?limit=100")),
+        Scenario("time-entries.list", get(lambda d, r: "/time-entries/?limit=50")),
+        Scenario(
+            "time-entries.list.project",
+            get(lambda d, r: f"/time-entries/?project_id={r.randint(1, d.projects)}&limit=50"),
+        ),
+        Scenario(
+            "time-entries.list.customer",
+            get(lambda d, r: f"/time-entries/?customer_id={r.randint(1, d.customers)}&{_range(d, r, 30)}&limit=50"),
+        ),
+        Scenario("time-entries.list.range", get(lambda d, r: f"/time-entries/?{_range(d, r, 7)}&limit=50")),
+        Scenario(
+            "time-entries.list.deep-offset",
+            get(lambda d, r: f"/time-entries/?skip={d.max_entry_id // 2}&limit=50"),
+        ),
+        Scenario("time-entries.page.deep-cursor", get(lambda d, r: f"/time-entries/page?cursor={_deep_cursor(d, r)}&limit=50")),
+        Scenario("time-entries.export.month", get(lambda d, r: f"/time-entries/export?format=ndjson&{_range(d, r, 30)}")),
+        Scenario("reports.by-project", get(lambda d, r: "/reports/by-project")),
+        Scenario("reports.by-customer", get(lambda d, r: "/reports/by-customer")),
+        Scenario("reports.by-project.quarter", get(lambda d, r: f"/reports/by-project?{_range(d, r, 90)}")),
+        Scenario("reports.summary", get(lambda d, r: "/reports/summary")),
+        Scenario("reports.dashboard", get(lambda d, r: "/reports/dashboard")),
+        Scenario("reports.timeseries", get(lambda d, r: f"/reports/timeseries?bucket=week&group_by=customer&{_range(d, r, 365)}")),
+        Scenario("reports.analytics", get(lambda d, r: "/reports/analytics?capacity=4000")),
+        Scenario("reports.analytics.quarter", get(lambda d, r: f"/reports/analytics?{_range(d, r, 90)}")),
+        Scenario("search.common", get(lambda d, r: "/search/?q=invoice&limit=20")),
+        Scenario("search.rare", get(lambda d, r: f"/search/?q=TM-{r.randrange(1, 100_000)}&limit=20")),
+        Scenario("system.metrics", get(lambda d, r: "/metrics")),
+        Scenario("customers.create", send("POST", lambda d, r: "/customers/", lambda d, r: {"name": _unique("Bench")})),
+        Scenario(
+            "customers.update",
+            send("PUT", lambda d, r: f"/customers/{r.randint(1, d.customers)}", lambda d, r: {"active": True}),
+        ),
+        Scenario(
+            "departments.create",
+            send(
+                "POST",
+                lambda d, r: "/departments/",
+                lambda d, r: {"name": _unique("Bench"), "customer_id": r.randint(1, d.customers)},
+            ),
+        ),
+        Scenario(
+            "projects.create",
+            send(
+                "POST",
+                lambda d, r: "/projects/",
+                lambda d, r: {"name": _unique("Bench"), "customer_id": r.randint(1, d.customers)},
+            ),
+        ),
+        Scenario(
+            "projects.update",
+            send("PUT", lambda d, r: f"/projects/{r.randint(1, d.projects)}", lambda d, r: {"active": True}),
+        ),
+        Scenario("time-entries.create", send("POST", lambda d, r: "/time-entries/", _entry)),
+        Scenario(
+            "time-entries.bulk",
+            send("POST", lambda d, r: "/time-entries/bulk", lambda d, r: [_entry(d, r) for _ in range(bulk_rows)]),
+        ),
+        Scenario(
+            "time-entries.update",
+            send("PUT", lambda d, r: f"/time-entries/{r.randint(1, d.max_entry_id // 2)}", lambda d, r: {"hours": 1.5}),
+        ),
+        Scenario("time-entries.delete", send("DELETE", _delete_path(delete_ids), lambda d, r: None)),
+    ]
+
+
+def run_suite(base_url: str, data: Dataset, selected: list[Scenario], duration: float, concurrency: int, warmup: float):
+    results = {}
+    for scenario in selected:
+        rng = random.Random(scenario.name)
+        fn = scenario.build(base_url, data, rng)
+        if warmup > 0:
+            loadgen.run(base_url, [(scenario.name, fn)] * concurrency, warmup)
+        stats = loadgen.run(base_url, [(scenario.name, fn)] * concurrency, duration)
+        summary = loadgen.summarize(stats, duration)[scenario.name]
+        results[scenario.name] = summary
+        print(
+            f"{scenario.name:32} {summary['rps']:9.1f} req/s  p50 {summary['p50_ms']:8.2f} ms"
+            f"  p99 {summary['p99_ms']:8.2f} ms  {summary['errors']:4.0f} err",
+            flush=True,
+        )
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list[str]:
+    """Scenarios whose latency rose (or throughput fell) by more than ``tolerance`` against ``baseline``."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        reasons = []
+        for metric in ("p50_ms", "p99_ms"):
+            delta = current[metric] - base[metric]
+            if delta > min_delta_ms and current[metric] > base[metric] * (1 + tolerance):
+                reasons.append(f"{metric} {base[metric]:.2f} -> {current[metric]:.2f}")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            reasons.append(f"rps {base['rps']:.1f} -> {current['rps']:.1f}")
+        if current["errors"] and not base["errors"]:
+            reasons.append(f"{current['errors']:.0f} errors")
+        if reasons:
+            regressions.append(f"{name}: {', '.join(reasons)}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="database to benchmark (default: a fresh seeded SQLite file)")
+    parser.add_argument("--reuse", action="store_true", help="benchmark --url as is instead of seeding it")
+    parser.add_argument("--customers", type=int, default=1_000)
+    parser.add_argument("--departments", type=int, default=500)
+    parser.add_argument("--projects", type=int, default=5_000)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--profile", default="production", choices=["default", "production"])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--only", action="append", default=[], help="run scenarios whose name contains this")
+    parser.add_argument("--save", type=Path, help="write results to this baseline file")
+    parser.add_argument("--compare", type=Path, help="baseline file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        if not args.reuse:
+            engine = create_engine(url)
+            seed(
+                engine,
+                customers=args.customers,
+                departments=args.departments,
+                projects=args.projects,
+                entries=args.entries,
+                progress=True,
+            )
+            engine.dispose()
+        data = Dataset.load(url)
+        selected = [s for s in scenarios(data) if not args.only or any(part in s.name for part in args.only)]
+        env = {"TIMEMANAGER_DATABASE_URL": url, "TIMEMANAGER_ENGINE_PROFILE": args.profile}
+        with serve(env) as base_url:
+            results = run_suite(base_url, data, selected, args.duration, args.concurrency, args.warmup)
+
+    meta = {
+        "entries": data.max_entry_id,
+        "profile": args.profile,
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+        print(f"baseline written to {args.save}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        regressions = compare(results, baseline["results"], args.tolerance, args.min_delta_ms)
+        print("\n".join(f"REGRESSION {line}" for line in regressions) or f"no regressions against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
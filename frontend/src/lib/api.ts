@@ -4,10 +4,11 @@ const API_URL = VITE_API_URL || 'http://localhost:8000'
 
 export async function api<T>(path: string, options?: RequestInit): Promise<T> {
   const res = await fetch(`${API_URL}${path}`, {
+    ...options,
     headers: {
       'Content-Type': 'application/json',
+      ...(options?.headers as Record<string, string> | undefined),
     },
-    ...options,
   })
   if (!res.ok) {
     const text = await res.text()
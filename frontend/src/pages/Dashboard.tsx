@@ -30,6 +30,12 @@ type TimeEntry = {
   billable: boolean
 }
 
+type DashboardReport = {
+  by_project: SummaryProject[]
+  by_customer: SummaryCustomer[]
+  recent_entries: TimeEntry[]
+}
+
 export default function Dashboard() {
   const [byProject, setByProject] = useState<SummaryProject[]>([])
   const [byCustomer, setByCustomer] = useState<SummaryCustomer[]>([])
@@ -49,13 +55,17 @@ export default function Dashboard() {
   const [formSuccess, setFormSuccess] = useState<string | null>(null)
 
   const canCreate = useMemo(() => !!projectId && !!date && Number(hours) > 0, [projectId, date, hours])
+  // One key per form state: resubmitting after a timeout replays the first result instead of
+  // logging the task twice, while any edit (or the reset after success) starts a new entry.
+  const idempotencyKey = useMemo(() => crypto.randomUUID(), [projectId, date, hours, description, billable])
+
+  function applyDashboard(d: DashboardReport) {
+    setByProject(d.by_project); setByCustomer(d.by_customer); setRecent(d.recent_entries)
+  }
 
   useEffect(() => {
-    Promise.all([
-      api<SummaryProject[]>('/reports/by-project'),
-      api<SummaryCustomer[]>('/reports/by-customer'),
-    ])
-      .then(([p, c]) => { setByProject(p); setByCustomer(c) })
+    api<DashboardReport>('/reports/dashboard?recent=10')
+      .then(applyDashboard)
       .catch(err => setError(String(err)))
   }, [])
 
@@ -63,9 +73,8 @@ export default function Dashboard() {
     Promise.all([
       api<Project[]>('/projects?limit=10000'),
       api<{ id: number; name: string }[]>('/customers?limit=10000'),
-      api<TimeEntry[]>('/time-entries?limit=10'),
     ])
-      .then(([projs, custs, rec]) => { setProjects(projs); setCustomers(custs); setRecent(rec) })
+      .then(([projs, custs]) => { setProjects(projs); setCustomers(custs) })
       .catch(err => setFormError(String(err)))
   }, [])
 
@@ -82,16 +91,15 @@ export default function Dashboard() {
       billable,
     }
     try {
-      await api('/time-entries', { method: 'POST', body: JSON.stringify(payload) })
+      await api('/time-entries', {
+        method: 'POST',
+        body: JSON.stringify(payload),
+        headers: { 'Idempotency-Key': idempotencyKey },
+      })
       setProjectId(''); setHours(''); setDescription(''); setBillable(true)
       setFormSuccess('Task logged successfully')
       // refresh summaries
-      const [p, c, rec] = await Promise.all([
-        api<SummaryProject[]>('/reports/by-project'),
-        api<SummaryCustomer[]>('/reports/by-customer'),
-        api<TimeEntry[]>('/time-entries?limit=10'),
-      ])
-      setByProject(p); setByCustomer(c); setRecent(rec)
+      applyDashboard(await api<DashboardReport>('/reports/dashboard?recent=10'))
     } catch (e) {
       setFormError(String(e))
     }
@@ -12,8 +12,11 @@ type TimeEntry = {
   billable: boolean
 }
 
+type ExpandedEntries = { items: TimeEntry[]; included: { projects: Project[] } }
+
 export default function TimeEntries() {
   const [entries, setEntries] = useState<TimeEntry[]>([])
+  const [projectNames, setProjectNames] = useState<Record<number, string>>({})
   const [projects, setProjects] = useState<Project[]>([])
   const [projectId, setProjectId] = useState<number | ''>('')
   const [date, setDate] = useState<string>('')
@@ -27,10 +30,12 @@ export default function TimeEntries() {
   async function load() {
     try {
       const [e, p] = await Promise.all([
-        api<TimeEntry[]>('/time-entries?limit=1000'),
+        // expand=project labels entries of inactive projects too, which the form's list leaves out
+        api<ExpandedEntries>('/time-entries?limit=1000&expand=project'),
         api<Project[]>('/projects?limit=1000&active=true'),
       ])
-      setEntries(e)
+      setEntries(e.items)
+      setProjectNames(Object.fromEntries(e.included.projects.map(p => [p.id, p.name])))
       setProjects(p)
     } catch (e) { setError(String(e)) }
   }
@@ -91,7 +96,7 @@ export default function TimeEntries() {
             {entries.map(e => (
               <tr key={e.id} className="border-t">
                 <td className="p-2">{new Date(e.work_date).toLocaleDateString()}</td>
-                <td className="p-2">{projects.find(p => p.id === e.project_id)?.name || e.project_id}</td>
+                <td className="p-2">{projectNames[e.project_id] ?? e.project_id}</td>
                 <td className="p-2">{e.hours.toFixed(2)}</td>
                 <td className="p-2">{e.billable ? 'Yes' : 'No'}</td>
                 <td className="p-2">{e.description || '—'}</td>